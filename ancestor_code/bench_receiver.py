@@ -0,0 +1,231 @@
+"""Benchmarks of each zotero_to_obsidian_note_receiver.py stage, on synthetic items (synthetic_zotero_items.py).
+
+Stages: note HTML -> markdown conversion, template rendering, note writing into a temporary vault, and
+end-to-end /webhook requests (Flask test client; dialogs and Obsidian launches are stubbed out).
+Results are saved as JSON, so a run can be compared with one from an earlier commit:
+
+    python bench_receiver.py --output bench_results/before.json
+    python bench_receiver.py --output bench_results/after.json --compare bench_results/before.json
+"""
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import synthetic_zotero_items as synthetic
+import zotero_to_obsidian_note_receiver as receiver
+
+# A stage whose median got this much slower than in the compared run is flagged
+REGRESSION_RATIO = 1.10
+
+
+def summarize(durations: list[float], ops_per_run: int = 1) -> dict:
+    """Seconds per run (min/median/mean/p95) and throughput."""
+    ordered = sorted(durations)
+    total = sum(ordered)
+    return {
+        "runs": len(ordered),
+        "ops_per_run": ops_per_run,
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": total / len(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        "total": total,
+        "ops_per_sec": ops_per_run * len(ordered) / total if total else None,
+    }
+
+
+def time_runs(fn: Callable[[], object], repeat: int) -> list[float]:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+# What open_obsidian_note reports for a note opened in a new tab
+OPENED_STATUS = {
+    "vault_found": True,
+    "note_found": True,
+    "uri_used": "obsidian://stub",
+    "new_tab_requested": True,
+    "new_tab_possible": True,
+}
+
+
+def stub_interactions(dialog_secs: float = 0, launch_secs: float = 0) -> None:
+    """No dialogs and no Obsidian launches: overwrite every existing note, pretend every open works.
+    dialog_secs and launch_secs stand in for a user answering and for Obsidian starting up."""
+
+    def answer_overwrite(*args, **kwargs) -> str:
+        time.sleep(dialog_secs)
+        return "overwrite"
+
+    def open_note(*args, **kwargs) -> dict:
+        time.sleep(launch_secs)
+        return dict(OPENED_STATUS)
+
+    receiver.ask_overwrite_popup = answer_overwrite
+    receiver.missing_notes_popup = lambda *args, **kwargs: time.sleep(dialog_secs)
+    receiver.onu.open_obsidian_note = open_note
+
+
+def bench_convert(items: list[dict], repeat: int) -> dict:
+    notes = [note for item in items for note in item["notes"]]
+    durations = time_runs(lambda: [receiver.zotero_note_html_to_md(note) for note in notes], repeat)
+    return summarize(durations, len(notes))
+
+
+def bench_render(items: list[dict], repeat: int) -> dict:
+    template = receiver.note_template()
+    rendered = []
+    for item in items:
+        item = dict(item)
+        item["notes"] = [receiver.zotero_note_html_to_md(note) for note in item["notes"]]
+        rendered.append(item)
+    durations = time_runs(lambda: [template.render(**item) for item in rendered], repeat)
+    return summarize(durations, len(rendered))
+
+
+def bench_write(items: list[dict], repeat: int, overwrite: bool) -> dict:
+    """Writing notes that don't exist yet, or (overwrite=True) replacing ones that do."""
+    durations = []
+    for run in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="receiver-bench-") as vault:
+            receiver.use_vault(vault)
+            # copies: the receiver replaces each item's notes with their markdown
+            if overwrite:
+                receiver.write_obsidian_md_note(
+                    [dict(item) for item in items], f"warm{run}", receiver.vaults.default
+                )
+                # same citekeys, different content, so every note is really rewritten
+                batch = [dict(item, title=item["title"] + " (revised)") for item in items]
+            else:
+                batch = [dict(item) for item in items]
+            start = time.perf_counter()
+            receiver.write_obsidian_md_note(batch, f"bench{run}", receiver.vaults.default)
+            durations.append(time.perf_counter() - start)
+    return summarize(durations, len(items))
+
+
+def bench_webhook(items: list[dict], repeat: int, batch_size: int) -> dict:
+    """POST /webhook with batch_size items per request, each run into a fresh vault."""
+    client = receiver.app.test_client()
+    batches = [items[i : i + batch_size] for i in range(0, len(items), batch_size)]
+    durations = []
+    for run in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="receiver-bench-") as vault:
+            receiver.use_vault(vault)
+            payloads = [
+                synthetic.make_payload(batch, idempotency_key=f"bench-{run}-{index}")
+                for index, batch in enumerate(batches)
+            ]
+            start = time.perf_counter()
+            for payload in payloads:
+                response = client.post("/webhook", json=payload)
+                if response.status_code != 200:
+                    raise RuntimeError(f"/webhook returned {response.status_code}: {response.get_data(True)}")
+            durations.append(time.perf_counter() - start)
+    return summarize(durations, len(items))
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(args: argparse.Namespace) -> dict:
+    items = synthetic.make_items(
+        args.items, seed=args.seed, notes=args.notes_per_item, note_blocks=args.note_blocks
+    )
+    stages = {}
+    for name, bench in (
+        ("convert", lambda: bench_convert(items, args.repeat)),
+        ("render", lambda: bench_render(items, args.repeat)),
+        ("write_new", lambda: bench_write(items, args.repeat, overwrite=False)),
+        ("write_overwrite", lambda: bench_write(items, args.repeat, overwrite=True)),
+        ("webhook", lambda: bench_webhook(items, args.repeat, args.batch_size)),
+    ):
+        print(f"{name} ...", end=" ", flush=True, file=sys.stderr)
+        stages[name] = bench()
+        print(f"{stages[name]['ops_per_sec']:.1f}/s", file=sys.stderr)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "items": args.items,
+            "notes_per_item": args.notes_per_item,
+            "note_blocks": args.note_blocks,
+            "batch_size": args.batch_size,
+            "repeat": args.repeat,
+        },
+        "stages": stages,
+    }
+
+
+def compare(results: dict, baseline: dict) -> list[str]:
+    """One line per stage, comparing median seconds per run with the baseline run's."""
+    lines = [f"vs {baseline['meta'].get('commit') or 'baseline'} (median per run):"]
+    for name, stage in results["stages"].items():
+        before = baseline["stages"].get(name)
+        if before is None:
+            lines.append(f"  {name:16} new stage")
+            continue
+        ratio = stage["median"] / before["median"] if before["median"] else float("inf")
+        flag = "  REGRESSION" if ratio > REGRESSION_RATIO else ""
+        lines.append(
+            f"  {name:16} {before['median'] * 1000:9.2f} ms -> {stage['median'] * 1000:9.2f} ms"
+            f"  ({ratio:.2f}x){flag}"
+        )
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--items", type=int, default=50, help="synthetic items per run")
+    parser.add_argument("--notes-per-item", type=int, default=3)
+    parser.add_argument("--note-blocks", type=int, default=12, help="paragraphs, lists, ... per note")
+    parser.add_argument("--batch-size", type=int, default=10, help="items per /webhook request")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per stage")
+    parser.add_argument("--output", type=Path, help="save results as JSON here")
+    parser.add_argument("--compare", type=Path, metavar="JSON", help="results of an earlier run")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    stub_interactions()
+    results = run_benchmarks(args)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Saved {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        print("\n".join(compare(results, json.loads(args.compare.read_text(encoding="utf-8")))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""Load test for zotero_to_obsidian_note_receiver.py: several stand-in Zotero senders posting to /webhook at once.
+
+Payloads are synthetic (synthetic_zotero_items.py), a mix of zotero_to_obsidian_note writes and
+open_obsidian_note requests, or recorded ones replayed from a file (a JSON list of /webhook bodies, or
+one body per line).  Each concurrency level runs for a fixed duration or number of requests and
+reports throughput, p50/p95/p99 latency and error rate, so waitress threads (RECEIVER_THREADS, which
+also sets each vault's share for writes) can be sized and the receiver's saturation point found:
+
+    python load_test_receiver.py --serve --threads 8 --concurrency 1,2,4,8,16 --duration 10
+    python load_test_receiver.py --url http://127.0.0.1:5050 --replay recorded.jsonl --rate 20
+
+--serve runs the receiver in this process under waitress, on a temporary vault, with its dialogs and
+Obsidian launches stubbed out (optionally with delays standing in for a user and for Obsidian).  Against
+a --url receiver they aren't: point it at a scratch vault and expect dialogs for existing notes.
+An in-process receiver shares the CPU (and the GIL) with the senders, so use a separate one for
+final numbers.
+
+With --rate, requests are sent on a fixed schedule and latency counts from the scheduled time, so
+time spent waiting for a free sender is included rather than hidden."""
+
+import argparse
+import json
+import logging
+import math
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Optional
+
+import synthetic_zotero_items as synthetic
+
+SENDER_IDS = ("zotero_to_obsidian_note", "open_obsidian_note")
+
+
+def percentile(ordered: list[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted values."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def load_payloads(path: Path) -> list[dict]:
+    """Recorded /webhook bodies: a JSON list, or one JSON object per line."""
+    text = path.read_text(encoding="utf-8").strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+class PayloadSource:
+    """Hands out request bodies.  Thread safe."""
+
+    def __init__(
+        self,
+        recorded: Optional[list[dict]] = None,
+        pool_size: int = 200,
+        batch_size: int = 5,
+        open_ratio: float = 0.2,
+        seed: int = 0,
+        unique_keys: bool = True,
+    ):
+        self.recorded = recorded
+        self.pool = [] if recorded else synthetic.make_items(pool_size, seed=seed, prefix="Load")
+        self.batch_size = batch_size
+        self.open_ratio = open_ratio
+        self.unique_keys = unique_keys
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def next(self) -> dict:
+        with self._lock:
+            if self.recorded:
+                payload = dict(self.recorded[self._count % len(self.recorded)])
+            else:
+                # citekeys repeat across requests, so there are creates, unchanged notes and overwrites
+                batch = self._rng.sample(self.pool, min(self.batch_size, len(self.pool)))
+                sender_id = SENDER_IDS[1] if self._rng.random() < self.open_ratio else SENDER_IDS[0]
+                payload = synthetic.make_payload(batch, sender_id=sender_id)
+            self._count += 1
+        if self.unique_keys:
+            # otherwise identical bodies within the receiver's replay window aren't processed again
+            payload["idempotency_key"] = f"load-{uuid.uuid4().hex}"
+        return payload
+
+
+class Result:
+    def __init__(self, sender_id: str, latency: float, status: Optional[int], error: Optional[str]):
+        self.sender_id = sender_id
+        self.latency = latency
+        self.status = status
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status is not None and self.status < 400
+
+
+def post(url: str, payload: dict, timeout: float) -> tuple[Optional[int], Optional[str]]:
+    """POST one /webhook body.  Returns (HTTP status, error description)."""
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status, None
+    except urllib.error.HTTPError as e:
+        return e.code, f"HTTP {e.code}"
+    except (urllib.error.URLError, OSError) as e:
+        reason = getattr(e, "reason", e)
+        return None, type(reason).__name__ if not isinstance(reason, str) else reason
+
+
+def run_level(
+    url: str,
+    source: PayloadSource,
+    concurrency: int,
+    duration: Optional[float],
+    requests: Optional[int],
+    rate: Optional[float],
+    timeout: float,
+) -> dict:
+    """Run `concurrency` senders until the duration or request count is used up; summarize."""
+    results: list[Result] = []
+    results_lock = threading.Lock()
+    counter_lock = threading.Lock()
+    issued = 0
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+
+    def next_slot() -> Optional[float]:
+        """The time this sender's next request is due, or None when the level is done."""
+        nonlocal issued
+        with counter_lock:
+            if requests is not None and issued >= requests:
+                return None
+            due = started + issued / rate if rate else time.perf_counter()
+            if deadline is not None and due >= deadline:
+                return None
+            issued += 1
+            return due
+
+    def sender() -> None:
+        while (due := next_slot()) is not None:
+            payload = source.next()
+            if (delay := due - time.perf_counter()) > 0:
+                time.sleep(delay)
+            status, error = post(url, payload, timeout)
+            result = Result(payload.get("sender_id", ""), time.perf_counter() - due, status, error)
+            with results_lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=sender, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    summary = summarize(results, elapsed)
+    summary["concurrency"] = concurrency
+    summary["target_rate"] = rate
+    summary["by_sender"] = {
+        sender_id: summarize([r for r in results if r.sender_id == sender_id], elapsed)
+        for sender_id in sorted({r.sender_id for r in results})
+    }
+    return summary
+
+
+def summarize(results: list[Result], elapsed: float) -> dict:
+    latencies = sorted(r.latency for r in results if r.ok)
+    errors = [r for r in results if not r.ok]
+    outcome = Counter(str(r.status) if r.status is not None else r.error for r in results)
+    return {
+        "requests": len(results),
+        "errors": len(errors),
+        "error_rate": len(errors) / len(results) if results else 0.0,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            name: None if value is None else round(value * 1000, 2)
+            for name, value in (
+                ("p50", percentile(latencies, 0.50)),
+                ("p95", percentile(latencies, 0.95)),
+                ("p99", percentile(latencies, 0.99)),
+                ("max", latencies[-1] if latencies else None),
+            )
+        },
+        "responses": dict(outcome),
+    }
+
+
+def serve_in_process(
+    threads: int, dialog_secs: float, launch_secs: float
+) -> tuple[str, Callable[[], None]]:
+    """Start the receiver under waitress on a free local port, on a temporary vault with stubbed
+    interactions.  Returns the /webhook URL and a function that shuts it down."""
+    from waitress.server import create_server  # type: ignore
+
+    import zotero_to_obsidian_note_receiver as receiver
+    from bench_receiver import stub_interactions
+
+    vault = tempfile.TemporaryDirectory(prefix="receiver-load-")
+    receiver.use_vault(vault.name)
+    receiver.share_server_threads(threads)
+    stub_interactions(dialog_secs=dialog_secs, launch_secs=launch_secs)
+    receiver.warm_up()
+
+    server = create_server(receiver.app, host="127.0.0.1", port=0, threads=threads)
+    thread = threading.Thread(target=server.run, name="waitress", daemon=True)
+    thread.start()
+
+    def shutdown() -> None:
+        server.task_dispatcher.shutdown()
+        server.close()
+        vault.cleanup()
+
+    return f"http://127.0.0.1:{server.effective_port}/webhook", shutdown
+
+
+def print_table(levels: list[dict]) -> None:
+    print(
+        f"{'conc':>5} {'reqs':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'err %':>6}"
+    )
+    for level in levels:
+        latency = level["latency_ms"]
+        print(
+            f"{level['concurrency']:>5} {level['requests']:>6} {level['throughput_rps']:>8.1f}"
+            + "".join(
+                f" {latency[p]:>9.1f}" if latency[p] is not None else f" {'-':>9}"
+                for p in ("p50", "p95", "p99")
+            )
+            + f" {100 * level['error_rate']:>6.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="a running receiver's /webhook URL")
+    target.add_argument("--serve", action="store_true", help="run a stubbed receiver in this process")
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=8,
+        help="waitress threads, with --serve (the receiver's RECEIVER_THREADS is 8)",
+    )
+    parser.add_argument("--dialog-secs", type=float, default=0, help="stubbed dialog answer time")
+    parser.add_argument("--launch-secs", type=float, default=0, help="stubbed Obsidian launch time")
+
+    parser.add_argument("--replay", type=Path, metavar="FILE", help="recorded /webhook bodies to send")
+    parser.add_argument("--open-ratio", type=float, default=0.2, help="share of open_obsidian_note requests")
+    parser.add_argument("--batch-size", type=int, default=5, help="items per synthetic request")
+    parser.add_argument("--pool", type=int, default=200, help="distinct synthetic citekeys")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-unique-keys",
+        dest="unique_keys",
+        action="store_false",
+        help="don't give each request its own idempotency key (lets the receiver replay duplicates)",
+    )
+
+    parser.add_argument("--concurrency", default="1,2,4,8", help="comma-separated sender counts")
+    parser.add_argument("--rate", type=float, help="requests/s across all senders (default: as fast as possible)")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per concurrency level")
+    parser.add_argument("--requests", type=int, help="requests per level, instead of --duration")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request timeout, seconds")
+    parser.add_argument("--output", type=Path, help="save results as JSON here")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    # a line per queued request once it saturates; the latency percentiles already show that
+    logging.getLogger("waitress.queue").setLevel(logging.ERROR)
+    shutdown = None
+    if args.serve:
+        url, shutdown = serve_in_process(args.threads, args.dialog_secs, args.launch_secs)
+    else:
+        url = args.url
+
+    source = PayloadSource(
+        recorded=load_payloads(args.replay) if args.replay else None,
+        pool_size=args.pool,
+        batch_size=args.batch_size,
+        open_ratio=args.open_ratio,
+        seed=args.seed,
+        unique_keys=args.unique_keys,
+    )
+    levels = []
+    try:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            print(f"concurrency {concurrency} ...", file=sys.stderr, flush=True)
+            levels.append(
+                run_level(
+                    url,
+                    source,
+                    concurrency,
+                    duration=None if args.requests else args.duration,
+                    requests=args.requests,
+                    rate=args.rate,
+                    timeout=args.timeout,
+                )
+            )
+    finally:
+        if shutdown is not None:
+            shutdown()
+
+    print_table(levels)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        settings = {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()}
+        args.output.write_text(
+            json.dumps({"settings": settings, "levels": levels}, indent=2), encoding="utf-8"
+        )
+        print(f"Saved {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
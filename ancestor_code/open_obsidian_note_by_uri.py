@@ -5,10 +5,40 @@ Without that, it will back off to the default obsidian URI mechanism, which REUS
 
 import os
 import json
+import logging
 import urllib.parse
 import subprocess
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+# Parsed plugin config files, one cache per vault, keyed by path, valid while the file's mtime is unchanged
+_json_cache: dict[Path, dict[Path, tuple[int, object]]] = {}
+
+
+def _read_json(path: Path, vault_path: Path) -> object:
+    """json.load a small config file, reusing the last parse if the file hasn't changed."""
+    mtime_ns = path.stat().st_mtime_ns
+    vault_cache = _json_cache.setdefault(vault_path, {})
+    cached = vault_cache.get(path)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+    with path.open('r') as f:
+        data = json.load(f)
+    vault_cache[path] = (mtime_ns, data)
+    return data
+
+
+def preload_vault_config(vault_path: Path) -> None:
+    """Read the vault's plugin config now, so the first note open doesn't have to."""
+    if check_advanced_uri_plugin(vault_path) == (True, True):
+        check_newpane_setting(vault_path)
+
+
+def forget_vault_config(vault_path: Path) -> None:
+    """Drop a vault's cached plugin config (e.g. when the receiver stops serving it)."""
+    _json_cache.pop(vault_path, None)
+
 def check_advanced_uri_plugin(vault_path: Path) -> tuple[bool, bool]:
     """ Checks if the Advanced URI plugin is installed and enabled.
         vault_path: Path to the Obsidian vault, including the vault name itself
@@ -26,11 +56,10 @@ def check_advanced_uri_plugin(vault_path: Path) -> tuple[bool, bool]:
     is_enabled = False
     if is_installed and community_plugins_file.exists():
         try:
-            with community_plugins_file.open('r') as f:
-                enabled_plugins = json.load(f)
-                is_enabled = plugin_id in enabled_plugins
+            enabled_plugins = _read_json(community_plugins_file, vault_path)
+            is_enabled = plugin_id in enabled_plugins
         except Exception as e:
-            print(f"Error reading community plugins file: {e}")
+            logger.warning("Error reading community plugins file: %s", e)
     
     return is_installed, is_enabled
 
@@ -43,25 +72,46 @@ def check_newpane_setting(vault_path: Path) -> bool:
     plugin_data_path = vault_path / ".obsidian" / "plugins" / "obsidian-advanced-uri" / "data.json"
     
     if not plugin_data_path.exists():
-        print(f"Advanced URI plugin data file not found at: {plugin_data_path}")
+        logger.info("Advanced URI plugin data file not found at: %s", plugin_data_path)
         return False
     
     try:
-        with plugin_data_path.open('r') as f:
-            plugin_data = json.load(f)
-            
+        plugin_data = _read_json(plugin_data_path, vault_path)
+
         return plugin_data.get("openFileWithoutWriteInNewPane", False)
             
     except Exception as e:
-        print(f"Error reading Advanced URI plugin settings: {e}")
+        logger.warning("Error reading Advanced URI plugin settings: %s", e)
         return False
     
-def open_obsidian_note(note_path: str, vault_path: Path | str | None = None, new_tab: bool = True) -> dict:
+def launch_uri(uri: str, wait: bool = True) -> None:
+    """ Hands an obsidian:// URI to the OS.  With wait=False, returns as soon as the launcher has
+        started, instead of when it exits (several notes can then be opened without queueing behind
+        each launch). """
+    if os.name == 'nt':  # Windows
+        command = f'start "" "{uri}"'
+    elif os.name == 'posix':  # macOS or Linux
+        if Path('/proc/version').exists() and 'microsoft' in Path('/proc/version').read_text().lower():
+            command = f'cmd.exe /c start "" "{uri}"' # it's Linux but WSL
+        elif Path('/System').exists():  # macOS
+            command = ['open', uri]
+        else:  # Linux
+            command = ['xdg-open', uri]
+    else:
+        raise OSError(f"Don't know how to open URIs on {os.name}")
+
+    process = subprocess.Popen(command, shell=isinstance(command, str))
+    if wait:
+        process.wait()
+
+def open_obsidian_note(note_path: str, vault_path: Path | str | None = None, new_tab: bool = True,
+                       wait: bool = True) -> dict:
     """ Opens an Obsidian note in a new tab, if possible and requested.
           note_path: internal obsidian path from the vault root to the note (without .md)
           vault_path: Full path to the vault directory (Path object or string)
           new_tab: Whether to open in a new tab (requires Obsidian's Advanced URI plugin, 
                    with its "Open file without write in new pane" option enabled)
+          wait: Whether to wait for the OS launcher to exit (see launch_uri)
     
           Returns: dict: Status information about the operation (see comments)"""
     
@@ -87,7 +137,7 @@ def open_obsidian_note(note_path: str, vault_path: Path | str | None = None, new
         status["method_used"] = "none"
         return status
     
-    print(f'{note_path=}')
+    logger.debug("note_path=%r", note_path)
     if not note_path.endswith('.md'):
         note_path += '.md'
     status["note_found"] = (vault_path / note_path).exists()
@@ -119,22 +169,13 @@ def open_obsidian_note(note_path: str, vault_path: Path | str | None = None, new
         
         status["uri_used"] = uri
     except Exception as e:
-        print(f"Error building URI: {e}")
+        logger.warning("Error building URI: %s", e)
     
     if status["note_found"] and status["uri_used"]:
         try:
-            uri = status["uri_used"]
-            if os.name == 'nt':  # Windows
-                os.system(f'start "" "{uri}"')
-            elif os.name == 'posix':  # macOS or Linux
-                if Path('/proc/version').exists() and 'microsoft' in Path('/proc/version').read_text().lower():
-                    os.system(f'cmd.exe /c start "" "{uri}"') # it's Linux but WSL
-                elif Path('/System').exists():  # macOS
-                    subprocess.run(['open', uri])
-                else:  # Linux
-                    subprocess.run(['xdg-open', uri])
+            launch_uri(status["uri_used"], wait=wait)
         except Exception as e:
-            print(f"Error opening URI: {e}")
+            logger.warning("Error opening URI: %s", e)
     
     return status
 
@@ -0,0 +1,509 @@
+"""Asyncio (ASGI) serving mode for zotero_to_obsidian_note_receiver.py.
+
+Under waitress every request holds one of a fixed number of threads for as long as it runs, including
+while it waits on an overwrite dialog, on an Obsidian launch or on a duplicate request.  Here requests
+are asyncio tasks:
+- blocking work goes to bounded thread pools: each vault's own worker pool for converting,
+  writing and opening the notes it writes (the waitress app's own code, see
+  receiver.create_item_note), one for launching the notes an open request asks for
+  (ASYNC_LAUNCH_THREADS), and a small one for status, dialog bookkeeping and looking up the notes to
+  open (ASYNC_FILE_THREADS);
+- the long waits (a user's overwrite answer, a note locked by another request or worker, the first of
+  several duplicate requests finishing) are awaited on the event loop and hold no thread at all.
+
+/webhook, /status, /health, /ready, /metrics, /dialog_response and /changes behave as in the waitress
+app, and the two modes can share a vault (and coordination directory).  /changes long polls and
+streams wait on the event loop too, so there's no cap on how many clients follow the feed.  The feed
+is per process: to follow it, run one (no `uvicorn --workers`), see receiver_changes.py.  /notes and
+/profiles are waitress-only.
+
+A /webhook request asking for a profile (X-Profile: 1, ?profile=1) is cProfiled as in the waitress
+app: it runs the waitress app's code, waits and all, on one of its vault's workers, since cProfile
+follows a single thread.  Slow requests aren't stack sampled here (PROFILE_SLOW_SECS): their work moves between
+threads.
+
+Needs an ASGI server (pip install uvicorn):
+
+    python receiver_asgi.py
+    uvicorn receiver_asgi:app --port 5050
+
+Either way logging goes to RECEIVER_LOG_FILE as in the waitress app (set up at lifespan startup if
+nothing set it up before).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+import zotero_to_obsidian_note_receiver as receiver
+from receiver_changes import sse_events, sse_retry
+from receiver_coordination import LockTimeout
+from receiver_idempotency import idempotency_key, payload_fingerprint
+from receiver_profiling import profile_asked
+from receiver_logging import log_context, logging_configured
+from receiver_vaults import UnknownVault, Vault, VaultBusy, vault_id_of
+
+logger = logging.getLogger(__name__)
+
+file_pool = ThreadPoolExecutor(receiver.ASYNC_FILE_THREADS, thread_name_prefix="receiver-file")
+launch_pool = ThreadPoolExecutor(receiver.ASYNC_LAUNCH_THREADS, thread_name_prefix="receiver-launch")
+
+
+async def run_blocking(pool: ThreadPoolExecutor, fn: Callable, *args):
+    """fn(*args) on one of the pool's threads, with this task's log context."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        pool, functools.partial(context.run, fn, *args)
+    )
+
+
+# Requests
+
+
+class _Headers(dict):
+    """Request headers, looked up case-insensitively."""
+
+    def __init__(self, raw: list):
+        super().__init__((k.decode("latin-1").lower(), v.decode("latin-1")) for k, v in raw)
+
+    def get(self, name: str, default=None):
+        return super().get(name.lower(), default)
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _respond(
+    send, status: int, body, content_type: str = "application/json", headers: Optional[dict] = None
+) -> None:
+    if content_type == "application/json":
+        body = json.dumps(body)
+    data = body.encode("utf-8")
+    raw_headers = [(b"content-type", content_type.encode()), (b"content-length", str(len(data)).encode())]
+    raw_headers += [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": data})
+
+
+async def app(scope, receive, send) -> None:
+    """The ASGI application."""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    method, path = scope["method"], scope["path"]
+    args = dict(urllib.parse.parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+    if method == "POST" and path == "/webhook":
+        status, body, headers = await webhook(
+            _Headers(scope["headers"]), args, await _read_body(receive)
+        )
+        await _respond(send, status, body, headers=headers)
+    elif method == "POST" and path.startswith("/dialog_response/"):
+        status, text = await dialog_response(path.rsplit("/", 1)[1], await _read_body(receive))
+        await _respond(send, status, text, "text/plain; charset=utf-8")
+    elif method == "GET" and path == "/status":
+        await _respond(send, 200, await run_blocking(file_pool, receiver.status_body))
+    elif method == "GET" and path == "/health":
+        await _respond(send, 200, {"status": "ok", "time": datetime.now().isoformat()})
+    elif method == "GET" and path == "/ready":
+        is_ready = receiver.ready.is_set()
+        body = {"ready": is_ready, "time": datetime.now().isoformat()}
+        await _respond(send, 200 if is_ready else 503, body)
+    elif method == "GET" and path == "/metrics":
+        await _respond(send, 200, receiver.metrics.render(), "text/plain; version=0.0.4")
+    elif method == "GET" and path == "/changes":
+        await _respond(send, *await changes(args))
+    elif method == "GET" and path == "/changes/stream":
+        await change_stream(_Headers(scope["headers"]), args, receive, send)
+    else:
+        await _respond(send, 404, {"status": "error", "message": f"No route {method} {path}"})
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            if not logging_configured():
+                # served as `uvicorn receiver_asgi:app` rather than from __main__
+                receiver.start_logging()
+            receiver.sweeper.start()
+            threading.Thread(target=receiver.warm_up, name="warm-up", daemon=True).start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            file_pool.shutdown(wait=False)
+            launch_pool.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def dialog_response(dialog_id: str, body: bytes) -> tuple[int, str]:
+    """An overwrite dialog answer from the browser.  Any worker, of either mode, can take it."""
+    form = urllib.parse.parse_qs(body.decode("utf-8"))
+    action = form.get("action", ["skip"])[0]
+
+    def post_answer() -> bool:
+        return any(vault.coord.post_answer(dialog_id, action) for vault in receiver.vaults)
+
+    if not await run_blocking(file_pool, post_answer):
+        logger.warning(
+            "Dropped answer '%s' for dialog %s: it has closed (timed out) or never existed",
+            action,
+            dialog_id,
+        )
+        return 404, "Dialog not found"
+    logger.info("Dialog %s response: %s", dialog_id, action)
+    return 200, "OK"
+
+
+async def webhook(headers: _Headers, args: dict, raw_body: bytes) -> tuple[int, dict, dict]:
+    """/webhook, as in the waitress app: (HTTP status, response body, extra headers)."""
+    request_id = str(uuid.uuid4())[:8]
+    with log_context(request_id=request_id):
+        logger.info("Received webhook request")
+        started = time.perf_counter()
+        sender = "unknown"  # metric label, see sender_label()
+        vault_id = None
+        profile_requested = profile_asked(headers.get("X-Profile"), args.get("profile"))
+        try:
+            with receiver.stage_seconds.time(stage="parse"):
+                payload = json.loads(raw_body)
+            sender = receiver.sender_label(payload.get("sender_id"))
+            vault = receiver.vaults.get(vault_id_of(headers, args, payload))
+            vault_id = vault.vault_id
+            key, client_supplied = idempotency_key(headers, payload)
+            ttl_secs = (
+                receiver.IDEMPOTENCY_TTL_SECS
+                if client_supplied
+                else receiver.IDEMPOTENCY_DERIVED_TTL_SECS
+            )
+            if profile_requested:
+                process = functools.partial(profiled_process_webhook, payload, request_id, vault)
+            else:
+                process = functools.partial(process_webhook, payload, request_id, vault)
+            (body, status_code), replayed = await vault.idempotency.run_async(
+                key, ttl_secs, process, payload_fingerprint(payload)
+            )
+        except tuple(receiver.REQUEST_ERROR_STATUS) as e:
+            status_code = receiver.REQUEST_ERROR_STATUS[type(e)]
+            logger.warning("%s", e)
+            elapsed = time.perf_counter() - started
+            receiver.webhook_seconds.observe(
+                elapsed, vault=vault_id, sender_id=sender, code=status_code
+            )
+            body = {"status": "error", "message": str(e), "request_id": request_id}
+            return status_code, body, {"Retry-After": "5"} if status_code == 503 else {}
+        except Exception as e:
+            logger.exception("Error processing webhook data: %s", e)
+            elapsed = time.perf_counter() - started
+            receiver.webhook_seconds.observe(elapsed, vault=vault_id, sender_id=sender, code=500)
+            return 500, {"status": "error", "message": str(e), "request_id": request_id}, {}
+
+        elapsed = time.perf_counter() - started
+        receiver.webhook_seconds.observe(elapsed, vault=vault_id, sender_id=sender, code=status_code)
+        if not receiver._first_request_seen.is_set():
+            receiver._first_request_seen.set()
+            receiver.startup_seconds.set(elapsed, phase="first_request")
+        cache_counter = receiver.cache_hits_total if replayed else receiver.cache_misses_total
+        cache_counter.inc(cache="idempotency")
+        if replayed:
+            logger.info("Duplicate of request %s, replaying its result", body.get("request_id"))
+
+        response_headers = {"Idempotent-Replayed": "true" if replayed else "false"}
+        body = dict(body, vault_id=vault_id, idempotency_key=key, replayed=replayed)
+        return status_code, body, response_headers
+
+
+async def process_webhook(payload: dict, request_id: str, vault: Vault) -> tuple[dict, int]:
+    """Act on one webhook payload, in its vault.  Returns the response body and HTTP status."""
+    if (error := receiver.check_webhook_payload(payload)) is not None:
+        return error
+    try:
+        sender_id = payload["sender_id"]
+        webhook_item_list = payload["data"]
+
+        logger.info("Processing %d items", len(webhook_item_list))
+        if not await run_blocking(file_pool, receiver.ensure_storage_dir, vault, request_id):
+            return receiver.storage_dir_error(request_id)
+
+        if sender_id == receiver.SENDER_ID_ZOTERO_TO_OBSIDIAN_NOTE:
+            with vault.admit():  # VaultBusy if the vault's queue is full
+                results = await write_notes(webhook_item_list, request_id, vault)
+            summary = {}
+        else:
+            create_missing = payload.get("create_missing", receiver.OPEN_CREATE_MISSING)
+            summary = await open_notes(
+                webhook_item_list, request_id, vault, create_missing=bool(create_missing)
+            )
+            results = summary.pop("results")
+
+        logger.info("Ended webhook message processing with %d items acted upon", len(results))
+        return receiver.webhook_success(results, request_id, **summary)
+
+    except VaultBusy:
+        raise
+    except Exception as e:
+        logger.exception("Error processing webhook data: %s", e)
+        return {"status": "error", "message": str(e), "request_id": request_id}, 500
+
+
+async def profiled_process_webhook(
+    payload: dict, request_id: str, vault: Vault
+) -> tuple[dict, int]:
+    """process_webhook for a request that asked to be profiled (X-Profile, ?profile).  cProfile
+    follows one thread, so the request runs the waitress app's way on one of the vault's workers,
+    waits and all, under receiver.profiler."""
+
+    def profiled() -> tuple[dict, int]:
+        admit = (
+            vault.admit()
+            if payload.get("sender_id") == receiver.SENDER_ID_ZOTERO_TO_OBSIDIAN_NOTE
+            else contextlib.nullcontext()
+        )
+        with receiver.profiler.profile(request_id, requested=True), admit:
+            return receiver.process_webhook(payload, request_id, vault)
+
+    return await run_blocking(vault.pool, profiled)
+
+
+# The change feed
+
+
+async def changes(args: dict) -> tuple[int, dict]:
+    """/changes, as in the waitress app: a long poll for note changes since args["cursor"]."""
+    try:
+        vault = receiver.vaults.get(args.get(receiver.VAULT_ID_QUERY_ARG))
+    except UnknownVault as e:
+        return 404, {"status": "error", "message": str(e)}
+    cursor = args.get("cursor") or None
+    try:
+        timeout = min(float(args.get("timeout", receiver.CHANGES_POLL_SECS)), receiver.CHANGES_POLL_SECS)
+        limit = min(int(args.get("limit", receiver.NOTES_PAGE_SIZE)), receiver.NOTES_PAGE_SIZE_MAX)
+        pending = vault.changes.pending(cursor)
+    except ValueError as e:
+        return 400, {"status": "error", "message": str(e)}
+    if limit < 1:
+        return 400, {"status": "error", "message": "limit must be positive"}
+
+    if pending or timeout <= 0:
+        body = vault.changes.since(cursor, limit)
+    else:
+        body = await vault.wait_changes_async(cursor, timeout, limit)
+    return 200, dict(body, vault_id=vault.vault_id)
+
+
+async def change_stream(headers: _Headers, args: dict, receive, send) -> None:
+    """/changes/stream, as in the waitress app: note changes as Server-Sent Events, until the client
+    goes away or CHANGES_STREAM_SECS are up."""
+    try:
+        vault = receiver.vaults.get(args.get(receiver.VAULT_ID_QUERY_ARG))
+    except UnknownVault as e:
+        await _respond(send, 404, {"status": "error", "message": str(e)})
+        return
+    cursor = headers.get("Last-Event-ID") or args.get("cursor") or None
+    try:
+        vault.changes.pending(cursor)
+    except ValueError as e:
+        await _respond(send, 400, {"status": "error", "message": str(e)})
+        return
+
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        }
+    )
+    retry = sse_retry(receiver.CHANGES_RETRY_SECS).encode("utf-8")
+    await send({"type": "http.response.body", "body": retry, "more_body": True})
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + receiver.CHANGES_STREAM_SECS
+    try:
+        while not disconnected.done() and loop.time() < deadline:
+            wait = asyncio.ensure_future(
+                vault.wait_changes_async(
+                    cursor, receiver.CHANGES_KEEPALIVE_SECS, receiver.NOTES_PAGE_SIZE
+                )
+            )
+            await asyncio.wait({wait, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if not wait.done():
+                wait.cancel()
+                break
+            body = wait.result()
+            data = "".join(sse_events(body, vault.changes.epoch)).encode("utf-8")
+            await send({"type": "http.response.body", "body": data, "more_body": True})
+            cursor = body["cursor"]
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        disconnected.cancel()
+
+
+async def _wait_disconnect(receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+# Writing and opening notes
+
+
+async def write_notes(items: list, request_id: str, vault: Vault) -> list:
+    """receiver.write_obsidian_md_note, with the lock and dialog waits on the event loop."""
+    total_items = len(items)
+    records = []
+    for index, item in enumerate(items):
+        if not receiver.item_is_writable(item):
+            continue
+
+        citekey = item["citekey"]
+        skip_all = False
+        with log_context(citekey=citekey):
+            try:
+                async with vault.coord.async_note_lock(
+                    citekey, timeout=receiver.NOTE_LOCK_TIMEOUT_SECS
+                ):
+                    skip_all = await write_one_item(
+                        item, index, total_items, records, request_id, vault
+                    )
+            except LockTimeout:
+                logger.warning("Skipping %s: another worker is still busy with it", citekey)
+        if skip_all:
+            logger.info("Skipping remaining items due to timeout or 'skip all' selection")
+            break
+    return records
+
+
+async def write_one_item(
+    item: dict, index: int, total_items: int, records: list, request_id: str, vault: Vault
+) -> bool:
+    """receiver.write_one_item for asyncio: both halves run on the vault's workers, the overwrite
+    answer is awaited between them.  Returns True if the user asked to skip all remaining items."""
+    obs_note_markdown = await run_blocking(
+        vault.pool, receiver.create_item_note, item, index, total_items, records, request_id, vault
+    )
+    if obs_note_markdown is None:
+        return False
+
+    with receiver.stage_seconds.time(stage="dialog_wait"):
+        answer = await ask_overwrite(vault, item["citekey"], request_id)
+    return await run_blocking(
+        vault.pool,
+        receiver.apply_overwrite_answer,
+        answer,
+        item,
+        obs_note_markdown,
+        records,
+        request_id,
+        vault,
+    )
+
+
+async def ask_overwrite(vault: Vault, citekey: str, request_id: str) -> str:
+    """receiver.ask_overwrite_popup, waiting for the answer on the event loop."""
+    coord = vault.coord
+    dialog_id = f"{request_id}-{uuid.uuid4().hex[:8]}"
+    info = {"citekey": citekey, "request_id": request_id, "vault": vault.vault_id}
+    await run_blocking(file_pool, coord.open_dialog, dialog_id, info)
+    receiver.start_popup(
+        receiver.overwrite_popup, coord, dialog_id, citekey, receiver.RECEIVER_BUTTON_WAIT_SECS
+    )
+    try:
+        answer = await coord.wait_answer_async(dialog_id, receiver.RECEIVER_BUTTON_WAIT_SECS)
+    finally:
+        await run_blocking(file_pool, coord.close_dialog, dialog_id)
+
+    if answer is None:
+        logger.info(
+            "No answer for %s within %ss, skipping it", citekey, receiver.RECEIVER_BUTTON_WAIT_SECS
+        )
+        return "skip"
+    logger.info("User selected '%s' for %s", answer, citekey)
+    return answer
+
+
+async def open_notes(
+    entries: list, request_id: str, vault: Vault, create_missing: bool = False
+) -> dict:
+    """receiver.open_notes_batch, creating any missing notes with the asyncio write path.  Only the
+    notes it creates queue for the vault's workers."""
+    existing, missing = await run_blocking(file_pool, receiver.resolve_notes, entries, vault)
+    results = await run_blocking(launch_pool, receiver.launch_notes, existing, request_id, vault)
+
+    created = []
+    if create_missing:
+        items = receiver.items_by_citekey(entries)
+        to_create = [items[citekey] for citekey in missing if citekey in items]
+        if to_create:
+            try:
+                with vault.admit():
+                    records = await write_notes(to_create, request_id, vault)
+            except VaultBusy as e:
+                logger.warning("%s; not creating the missing notes", e)
+                records = []
+            created = [record["citekey"] for record in records if record["status"] == "created"]
+            results += [f"Created note at {vault.note_path(citekey)}" for citekey in created]
+    missing = [citekey for citekey in missing if citekey not in created]
+
+    results += receiver.announce_missing(missing, request_id, vault)
+    return {"results": results, "opened": existing, "created": created, "missing": missing}
+
+
+def serve(host: str = "0.0.0.0", port: int = receiver.LISTEN_PORT) -> None:
+    """Serve app with uvicorn, on the receiver's port."""
+    try:
+        import uvicorn  # type: ignore
+    except ImportError:
+        raise SystemExit("The asyncio serving mode needs an ASGI server: pip install uvicorn")
+    uvicorn.run(app, host=host, port=port, log_config=None, lifespan="on")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Zotero to Obsidian note receiver, asyncio mode")
+    parser.add_argument("--port", type=int, default=receiver.LISTEN_PORT)
+    parser.add_argument(
+        "--log-level",
+        default=receiver.RECEIVER_LOG_LEVEL,
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="root log level",
+    )
+    parser.add_argument(
+        "--vaults",
+        type=Path,
+        default=receiver.RECEIVER_VAULTS_FILE,
+        metavar="FILE",
+        help="JSON file of the vaults to serve (see receiver_vaults.py)",
+    )
+    args = parser.parse_args()
+    receiver.start_logging(level=args.log_level)
+    if args.vaults != receiver.RECEIVER_VAULTS_FILE:
+        if not args.vaults.is_file():
+            parser.error(f"No vaults file {args.vaults}")
+        previous, receiver.vaults = receiver.vaults, receiver.load_vaults(args.vaults)
+        previous.close()
+    for vault in receiver.vaults:
+        logger.info("Vault %s: storage directory path: %s", vault.vault_id, vault.notes_dir)
+    logger.info("Starting asyncio receiver on port %s", args.port)
+    serve(port=args.port)
@@ -0,0 +1,202 @@
+"""A feed of note changes (added, modified, deleted) for clients that keep in sync with a vault.
+
+Relisting /notes to find out which Zotero items have notes costs a full listing every time.  Instead a
+client keeps a cursor and asks /changes for what happened since it, either as a long poll or as a
+Server-Sent Events stream (/changes/stream).
+
+A cursor is "<epoch>:<seq>".  The epoch names this feed: a restarted receiver, or another worker
+process, has a different one (a feed forked into a worker process starts over with a new one).  seq
+counts changes.  Only the last max_changes changes are kept, so a cursor from another epoch, or one
+older than that, gets a reset instead of changes: the client relists /notes and carries on from the
+cursor that came with the reset.  A client without a cursor starts the same way.
+
+The feed lives in one process.  Several worker processes sharing a port would each answer from their
+own feed, so a client's polls, spread over them, would mostly be resets: the receiver turns /changes
+away (501) when run with more than one worker, and an ASGI server should run it in one process.
+
+Changes come from the note index (receiver_index.py): the receiver's own writes, and rescans, which
+diff the notes directory against the previous snapshot (edits in Obsidian, deletions, notes arriving
+by sync)."""
+
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+import weakref
+from collections import deque
+from typing import Iterator, NamedTuple, Optional
+
+ADDED = "added"
+MODIFIED = "modified"
+DELETED = "deleted"
+
+
+class Change(NamedTuple):
+    seq: int
+    change: str  # ADDED, MODIFIED or DELETED
+    name: str
+    mtime: Optional[float]  # None for DELETED
+    size: Optional[int]
+    source: str  # "receiver" (its own write) or "scan"
+    time: float
+
+    def as_dict(self) -> dict:
+        return dict(
+            self._asdict(), citekey=self.name[:-3] if self.name.endswith(".md") else None
+        )
+
+
+class ChangeFeed:
+    """The recent changes to one notes directory, in order.  Thread safe; waiters can be threads
+    or asyncio tasks."""
+
+    def __init__(self, max_changes: int = 10000):
+        self.max_changes = max_changes
+        self._restart()
+        _feeds.add(self)
+
+    def _restart(self) -> None:
+        """A new epoch with no changes.  Also run in the child after a fork: feeds are made at
+        import, before serve_workers forks, and each worker process must have an epoch of its own."""
+        self.epoch = uuid.uuid4().hex[:8]
+        self._changes: deque[Change] = deque(maxlen=self.max_changes)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._async_waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = set()
+
+    @property
+    def cursor(self) -> str:
+        return f"{self.epoch}:{self._seq}"
+
+    def publish(
+        self, change: str, name: str, mtime: Optional[float], size: Optional[int], source: str
+    ) -> None:
+        with self._cond:
+            self._seq += 1
+            self._changes.append(Change(self._seq, change, name, mtime, size, source, time.time()))
+            self._cond.notify_all()
+            async_waiters, self._async_waiters = self._async_waiters, set()
+        for loop, future in async_waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    def _after(self, cursor: Optional[str]) -> Optional[int]:
+        """The seq a cursor points after, or None if it needs a reset.  ValueError if malformed."""
+        if not cursor:
+            return None
+        epoch, sep, seq = cursor.partition(":")
+        if not sep or not seq.isdigit():
+            raise ValueError(f"Malformed cursor {cursor!r}, expected <epoch>:<seq>")
+        after = int(seq)
+        if epoch != self.epoch or after > self._seq:
+            return None  # another receiver run or worker process
+        oldest = self._changes[0].seq if self._changes else self._seq + 1
+        if after < oldest - 1:
+            return None  # changes since then were already dropped
+        return after
+
+    def since(self, cursor: Optional[str], limit: int = 500) -> dict:
+        """Up to limit changes after cursor, and the cursor to ask with next.  ValueError if the
+        cursor is malformed."""
+        with self._cond:
+            after = self._after(cursor)
+            if after is None:
+                return {"cursor": self.cursor, "changes": [], "reset": True, "more": False}
+            # seqs are consecutive, so the changes after `after` start at a known offset
+            start = len(self._changes) - (self._seq - after)
+            changes = [self._changes[i] for i in range(start, min(start + limit, len(self._changes)))]
+            last = changes[-1].seq if changes else after
+            return {
+                "cursor": f"{self.epoch}:{last}",
+                "changes": [change.as_dict() for change in changes],
+                "reset": False,
+                "more": last < self._seq,
+            }
+
+    def pending(self, cursor: Optional[str]) -> bool:
+        """True if since(cursor) has something to say (changes or a reset).  ValueError if malformed."""
+        with self._cond:
+            after = self._after(cursor)
+            return after is None or after < self._seq
+
+    def wait(self, cursor: Optional[str], timeout: float) -> bool:
+        """Block until pending(cursor) or timeout.  Returns pending(cursor)."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self.pending(cursor):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    async def wait_async(self, cursor: Optional[str], timeout: float) -> bool:
+        """wait() on the event loop, holding no thread."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            with self._cond:
+                if self.pending(cursor):
+                    return True
+                future = loop.create_future()
+                waiter = (loop, future)
+                self._async_waiters.add(waiter)
+            try:
+                await asyncio.wait_for(future, max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                return self.pending(cursor)
+            finally:
+                with self._cond:
+                    self._async_waiters.discard(waiter)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "cursor": self.cursor,
+                "kept": len(self._changes),
+                "max_kept": self._changes.maxlen,
+                "waiting_tasks": len(self._async_waiters),
+            }
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+_feeds: "weakref.WeakSet[ChangeFeed]" = weakref.WeakSet()
+
+
+def _restart_feeds() -> None:
+    for feed in list(_feeds):
+        feed._restart()
+
+
+if hasattr(os, "register_at_fork"):  # not on Windows, where workers don't fork
+    os.register_at_fork(after_in_child=_restart_feeds)
+
+
+# Server-Sent Events
+
+
+def sse_retry(secs: float) -> str:
+    """Opens a stream: how long an EventSource waits before reconnecting, once the stream ends."""
+    return f"retry: {round(secs * 1000)}\n\n"
+
+
+def sse_event(event: str, data: dict, event_id: Optional[str] = None) -> str:
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+def sse_events(body: dict, epoch: str) -> Iterator[str]:
+    """A ChangeFeed.since() result as SSE events.  Each event's id is the cursor just after it, so
+    a reconnecting EventSource's Last-Event-ID picks up where it left off."""
+    if body["reset"]:
+        yield sse_event("reset", {"cursor": body["cursor"]}, body["cursor"])
+    for change in body["changes"]:
+        yield sse_event("change", change, f"{epoch}:{change['seq']}")
+    if not body["reset"] and not body["changes"]:
+        yield ": keep-alive\n\n"
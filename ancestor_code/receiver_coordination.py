@@ -0,0 +1,355 @@
+"""Cross-process coordination for zotero_to_obsidian_note_receiver.py.
+
+Per-note advisory file locks, plus a small file-backed board for overwrite dialog answers, so that
+several receiver processes can share one notes directory without racing on a citekey.  That's N worker
+processes behind one port on one host, or one receiver per host on a shared vault.
+
+The locks are OS advisory locks (lockf on posix, msvcrt on Windows) on small files in a coordination
+directory.  They work between processes on one host and between hosts on network filesystems that honor
+byte-range locks (SMB, NFSv4).  Cloud sync folders (OneDrive, Dropbox, ...) do NOT carry locks between
+machines, so for multi-host use put the coordination directory on a real network share.  By default
+it's a local directory (local_coord_dir), which is all the worker processes of one host need, and
+keeps lock and dialog files out of a synced vault."""
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import AsyncIterator, Iterator, Optional
+
+from receiver_sessions import ExpiringRegistry
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# How often a waiter re-checks a contended lock or an unanswered dialog
+POLL_SECS = 0.05
+# How often an asyncio waiter looks for an answer file posted by another worker process
+# (answers posted in this process wake it within POLL_SECS without touching the disk)
+ANSWER_FILE_POLL_SECS = 0.5
+
+
+class LockTimeout(TimeoutError):
+    """Raised when a lock couldn't be acquired within its timeout."""
+
+
+def safe_name(key: str) -> str:
+    """A filename for an arbitrary key: readable prefix plus a hash, so distinct keys never collide."""
+    readable = "".join(c if c.isalnum() or c in "-_." else "_" for c in key)[:64]
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    return f"{readable}-{digest}"
+
+
+def local_coord_dir(key: str) -> Path:
+    """A coordination directory on this host's local disk for `key` (e.g. a vault root): the
+    per-user app data directory on Windows, else the user cache directory."""
+    if os.name == "nt":
+        base = Path(os.environ.get("LOCALAPPDATA") or tempfile.gettempdir())
+    else:
+        base = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    return base / "zotero_receiver" / safe_name(key)
+
+
+class FileLock:
+    """Exclusive advisory lock on one file, held by one process at a time.  The file only exists
+    while the lock is in use: it's removed on release, so locks on one-off keys leave nothing behind.
+
+    OS record locks are owned by the process, not the thread, so callers within one process
+    must serialize themselves first (Coordinator.lock does that)."""
+
+    def __init__(self, path: Path, timeout: Optional[float] = None):
+        self.path = path
+        self.timeout = timeout
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> None:
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                self._lock(fd, deadline)
+            except BaseException:
+                os.close(fd)
+                raise
+            if self._is_current(fd):
+                self._fd = fd
+                return
+            # the previous holder removed the file as it let go: start over on the path's new file
+            self._unlock(fd)
+            os.close(fd)
+
+    def _lock(self, fd: int, deadline: Optional[float]) -> None:
+        while True:
+            try:
+                if os.name == "nt":
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except OSError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise LockTimeout(f"Timed out waiting for lock: {self.path}")
+                time.sleep(POLL_SECS)
+
+    def _unlock(self, fd: int) -> None:
+        if os.name == "nt":
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+
+    def _is_current(self, fd: int) -> bool:
+        """True if fd is still the file at self.path (Windows can't remove a file that's open)."""
+        if os.name == "nt":
+            return True
+        try:
+            linked = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        opened = os.fstat(fd)
+        return (linked.st_dev, linked.st_ino) == (opened.st_dev, opened.st_ino)
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            if os.name != "nt":
+                # removed while still held, so no one can lock it in between; waiters start over
+                self.path.unlink(missing_ok=True)
+            self._unlock(self._fd)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+        if os.name == "nt":
+            try:
+                self.path.unlink()
+            except OSError:
+                pass  # open in another process, which is waiting for or holding it: it's not idle
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class Coordinator:
+    """Named locks and shared dialog answers, all kept under one coordination directory.
+
+    Every receiver process (and host) that works on the same notes must use the same directory."""
+
+    def __init__(self, coord_dir: Path, dialog_ttl_secs: float = 300, max_dialogs: int = 256):
+        self.coord_dir = Path(coord_dir)
+        self.locks_dir = self.coord_dir / "locks"
+        self.dialogs_dir = self.coord_dir / "dialogs"
+
+        # in-process serialization in front of the OS locks: key -> [lock, number of users]
+        self._thread_locks: dict[str, list] = {}
+        self._thread_locks_guard = threading.Lock()
+        # and among asyncio tasks, ahead of that: key -> [asyncio.Lock, number of users]
+        self._async_locks: dict[str, list] = {}
+
+        # Dialog sessions open in this process, and the fast path for answers posted to them here.
+        # Bounded and expiring: a session whose waiter died never outlives dialog_ttl_secs.
+        self.dialog_ttl_secs = dialog_ttl_secs
+        self.dialog_sessions = ExpiringRegistry("dialog_sessions", max_dialogs, dialog_ttl_secs)
+        self._dirs_ready = False
+
+    def ensure_dirs(self) -> None:
+        if not self._dirs_ready:
+            self.locks_dir.mkdir(parents=True, exist_ok=True)
+            self.dialogs_dir.mkdir(parents=True, exist_ok=True)
+            self._dirs_ready = True
+
+    # Locks
+
+    @contextlib.contextmanager
+    def lock(self, key: str, timeout: Optional[float] = None) -> Iterator[None]:
+        """Hold the lock named `key` across threads and processes.
+        Raises LockTimeout if it can't be had within `timeout` seconds (None waits forever)."""
+        self.ensure_dirs()
+        name = safe_name(key)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._thread_locks_guard:
+            entry = self._thread_locks.setdefault(name, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            if not entry[0].acquire(timeout=-1 if timeout is None else timeout):
+                raise LockTimeout(f"Timed out waiting for in-process lock: {key}")
+            try:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                with FileLock(self.locks_dir / f"{name}.lock", timeout=remaining):
+                    yield
+            finally:
+                entry[0].release()
+        finally:
+            with self._thread_locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._thread_locks[name]
+
+    def note_lock(self, citekey: str, timeout: Optional[float] = None):
+        """Serialize all work on one note (write, overwrite prompt, open) across workers."""
+        return self.lock(f"note:{citekey}", timeout=timeout)
+
+    @contextlib.asynccontextmanager
+    async def async_lock(self, key: str, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """lock() for asyncio code.  Waits without holding a thread: tasks of one event loop queue
+        on an asyncio lock, and the same lock held by a thread or another process is polled for.
+        Excludes lock() holders of the same key, so both can be used in one process."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.ensure_dirs)
+        name = safe_name(key)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining() -> Optional[float]:
+            if deadline is None:
+                return None
+            if (left := deadline - time.monotonic()) <= 0:
+                raise LockTimeout(f"Timed out waiting for lock: {key}")
+            return left
+
+        async_entry = self._async_locks.setdefault(name, [asyncio.Lock(), 0])
+        async_entry[1] += 1
+        with self._thread_locks_guard:
+            thread_entry = self._thread_locks.setdefault(name, [threading.Lock(), 0])
+            thread_entry[1] += 1
+        try:
+            try:
+                await asyncio.wait_for(async_entry[0].acquire(), remaining())
+            except asyncio.TimeoutError:
+                raise LockTimeout(f"Timed out waiting for in-process lock: {key}") from None
+            try:
+                while not thread_entry[0].acquire(blocking=False):
+                    remaining()
+                    await asyncio.sleep(POLL_SECS)
+                try:
+                    file_lock = FileLock(self.locks_dir / f"{name}.lock", timeout=0)
+                    while True:
+                        try:
+                            await loop.run_in_executor(None, file_lock.acquire)  # one try
+                            break
+                        except LockTimeout:
+                            remaining()
+                            await asyncio.sleep(POLL_SECS)
+                    try:
+                        yield
+                    finally:
+                        await loop.run_in_executor(None, file_lock.release)
+                finally:
+                    thread_entry[0].release()
+            finally:
+                async_entry[0].release()
+        finally:
+            async_entry[1] -= 1
+            if async_entry[1] == 0:
+                del self._async_locks[name]
+            with self._thread_locks_guard:
+                thread_entry[1] -= 1
+                if thread_entry[1] == 0:
+                    del self._thread_locks[name]
+
+    def async_note_lock(self, citekey: str, timeout: Optional[float] = None):
+        """note_lock() for asyncio code."""
+        return self.async_lock(f"note:{citekey}", timeout=timeout)
+
+    # Dialogs
+
+    def _dialog_file(self, dialog_id: str) -> Path:
+        return self.dialogs_dir / f"{safe_name(dialog_id)}.json"
+
+    def _answer_file(self, dialog_id: str) -> Path:
+        return self.dialogs_dir / f"{safe_name(dialog_id)}.answer"
+
+    def open_dialog(self, dialog_id: str, info: dict) -> None:
+        """Announce a dialog that's waiting for an answer, visible to every worker."""
+        self.ensure_dirs()
+        record = dict(info, dialog_id=dialog_id, host=socket.gethostname(), pid=os.getpid(), opened=time.time())
+        atomic_write_text(self._dialog_file(dialog_id), json.dumps(record))
+        self.dialog_sessions.put(dialog_id, threading.Event())
+
+    def post_answer(self, dialog_id: str, action: str) -> bool:
+        """Record a dialog answer.  Returns False if no such dialog is open (anywhere)."""
+        if not self._dialog_file(dialog_id).exists():
+            return False
+        atomic_write_text(self._answer_file(dialog_id), action)
+        if event := self.dialog_sessions.get(dialog_id):
+            event.set()
+        return True
+
+    def wait_answer(self, dialog_id: str, timeout: float) -> Optional[str]:
+        """Wait for an answer posted by any worker.  Returns None on timeout."""
+        event = self.dialog_sessions.get(dialog_id) or threading.Event()
+        answer_file = self._answer_file(dialog_id)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return answer_file.read_text(encoding="utf-8")
+            except FileNotFoundError:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            event.wait(min(POLL_SECS, remaining))
+
+    async def wait_answer_async(self, dialog_id: str, timeout: float) -> Optional[str]:
+        """wait_answer() for asyncio code: waits on the event loop, without holding a thread."""
+        event = self.dialog_sessions.get(dialog_id) or threading.Event()
+        answer_file = self._answer_file(dialog_id)
+        deadline = time.monotonic() + timeout
+        next_file_check = 0.0
+        while True:
+            now = time.monotonic()
+            if event.is_set() or now >= next_file_check:
+                try:
+                    return answer_file.read_text(encoding="utf-8")
+                except FileNotFoundError:
+                    next_file_check = now + ANSWER_FILE_POLL_SECS
+            remaining = deadline - now
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(POLL_SECS, remaining))
+
+    def close_dialog(self, dialog_id: str) -> None:
+        self.dialog_sessions.pop(dialog_id)
+        for path in (self._answer_file(dialog_id), self._dialog_file(dialog_id)):
+            path.unlink(missing_ok=True)
+
+    def sweep(self) -> None:
+        """Drop expired dialog sessions, and dialog files left behind by workers that died mid-dialog."""
+        self.dialog_sessions.sweep()
+        cutoff = time.time() - self.dialog_ttl_secs
+        for path in self.dialogs_dir.glob("*"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink(missing_ok=True)
+            except OSError:
+                continue
+
+    def active_dialogs(self) -> list[str]:
+        """IDs of the dialogs currently open on any worker."""
+        ids = []
+        for path in self.dialogs_dir.glob("*.json"):
+            try:
+                ids.append(json.loads(path.read_text(encoding="utf-8"))["dialog_id"])
+            except (OSError, ValueError, KeyError):
+                continue  # closed or half-written in the meantime
+        return ids
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """Write so that readers on other workers never see a partial file."""
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
@@ -0,0 +1,220 @@
+"""Idempotent webhook requests for zotero_to_obsidian_note_receiver.py.
+
+Each request gets an idempotency key: the client's `Idempotency-Key` header or `idempotency_key` payload
+field, or else a hash of the payload (less fields that differ between sends of the same items, see
+VOLATILE_ITEM_FIELDS).  A request whose key is already being processed waits for, and
+returns, the first one's result instead of converting, rendering, prompting and opening tabs a second
+time.  Finished results are kept for a TTL, so a retry after a sender timeout returns instantly.  A
+client key reused with a different payload is refused (IdempotencyKeyReused, HTTP 422) rather than
+answered with the other payload's result.
+
+Duplicates are caught within one process (in-flight table) and across worker processes (a coordination
+lock per key plus the result saved in the coordination directory).  A key's lock file goes away when the
+lock is released, and its result file when the result expires (sweep)."""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from receiver_coordination import Coordinator, atomic_write_text, safe_name
+from receiver_sessions import ExpiringRegistry
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_PAYLOAD_FIELD = "idempotency_key"
+# Item fields the sender sets afresh on every send (exportDate is the send time, to the second), left
+# out of the payload hash so a double-fired send still matches
+VOLATILE_ITEM_FIELDS = ("exportDate",)
+
+# Results are (response body, HTTP status); server errors are never replayed
+Result = tuple[dict, int]
+
+
+class IdempotencyKeyReused(ValueError):
+    """Raised for a client idempotency key already used with a different payload."""
+
+
+def payload_fingerprint(payload: dict) -> str:
+    """A hash of what the payload asks for: without its idempotency key, or VOLATILE_ITEM_FIELDS."""
+    hashed = {k: v for k, v in payload.items() if k != IDEMPOTENCY_PAYLOAD_FIELD}
+    if isinstance(hashed.get("data"), list):
+        hashed["data"] = [
+            {k: v for k, v in item.items() if k not in VOLATILE_ITEM_FIELDS}
+            if isinstance(item, dict)
+            else item
+            for item in hashed["data"]
+        ]
+    canonical = json.dumps(hashed, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def idempotency_key(headers, payload: dict) -> tuple[str, bool]:
+    """The request's idempotency key, and whether the client supplied it (else it's a payload hash)."""
+    client_key = headers.get(IDEMPOTENCY_HEADER) or payload.get(IDEMPOTENCY_PAYLOAD_FIELD)
+    if client_key:
+        return f"client:{client_key}", True
+    return f"payload:{payload_fingerprint(payload)}", False
+
+
+def _check_fingerprint(key: str, fingerprint: Optional[str], first: Optional[str]) -> None:
+    if fingerprint is not None and first is not None and fingerprint != first:
+        raise IdempotencyKeyReused(
+            f"Idempotency key {key.partition(':')[2]!r} was already used with a different payload"
+        )
+
+
+class _InFlight:
+    def __init__(self, fingerprint: Optional[str]):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.result: Optional[Result] = None
+        self.error: Optional[BaseException] = None
+
+
+class IdempotencyCache:
+    """Runs each idempotency key's work once, and replays its result to duplicates."""
+
+    def __init__(self, coord: Coordinator, max_entries: int = 1000, default_ttl_secs: float = 120):
+        self.coord = coord
+        self.results_dir = coord.coord_dir / "results"
+
+        self._guard = threading.Lock()
+        self._inflight: dict[str, _InFlight] = {}  # entries live only while their request runs
+        # the same, for run_async: (future result, payload fingerprint)
+        self._inflight_async: dict[str, tuple[asyncio.Future, Optional[str]]] = {}
+        # key -> (result, payload fingerprint)
+        self.completed = ExpiringRegistry("webhook_results", max_entries, default_ttl_secs)
+
+    def run(
+        self,
+        key: str,
+        ttl_secs: float,
+        fn: Callable[[], Result],
+        fingerprint: Optional[str] = None,
+    ) -> tuple[Result, bool]:
+        """Return fn()'s result for this key, running fn at most once per TTL.
+        The second return value is True if the result was replayed rather than computed here.
+        With the payload's fingerprint, raises IdempotencyKeyReused if the key's result was for
+        another payload."""
+        with self._guard:
+            if (cached := self.completed.get(key)) is not None:
+                _check_fingerprint(key, fingerprint, cached[1])
+                return cached[0], True
+            inflight = self._inflight.get(key)
+            owner = inflight is None
+            if owner:
+                inflight = self._inflight[key] = _InFlight(fingerprint)
+
+        if not owner:
+            _check_fingerprint(key, fingerprint, inflight.fingerprint)
+            inflight.done.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return inflight.result, True
+
+        try:
+            # a duplicate may be running, or have finished, in another worker process
+            with self.coord.lock(f"idempotency:{key}"):
+                saved = self._disk_get(key)
+                replayed = saved is not None
+                if saved is None:
+                    result = fn()
+                    if result[1] < 500:
+                        self._store(key, ttl_secs, result, fingerprint)
+                else:
+                    result, first = saved
+                    _check_fingerprint(key, fingerprint, first)
+                    self.completed.put(key, saved, ttl_secs)
+            inflight.result = result
+            return result, replayed
+        except BaseException as e:
+            inflight.error = e
+            raise
+        finally:
+            inflight.done.set()
+            with self._guard:
+                del self._inflight[key]
+
+    async def run_async(
+        self,
+        key: str,
+        ttl_secs: float,
+        fn: Callable[[], Awaitable[Result]],
+        fingerprint: Optional[str] = None,
+    ) -> tuple[Result, bool]:
+        """run() for asyncio code: fn is a coroutine function, and duplicates wait for the first
+        request's result on the event loop instead of in a thread."""
+        if (cached := self.completed.get(key)) is not None:
+            _check_fingerprint(key, fingerprint, cached[1])
+            return cached[0], True
+        if (running := self._inflight_async.get(key)) is not None:
+            inflight, first = running
+            _check_fingerprint(key, fingerprint, first)
+            return await asyncio.shield(inflight), True
+
+        loop = asyncio.get_running_loop()
+        inflight = loop.create_future()
+        self._inflight_async[key] = (inflight, fingerprint)
+        try:
+            async with self.coord.async_lock(f"idempotency:{key}"):
+                saved = await loop.run_in_executor(None, self._disk_get, key)
+                replayed = saved is not None
+                if saved is None:
+                    result = await fn()
+                    if result[1] < 500:
+                        await loop.run_in_executor(
+                            None, self._store, key, ttl_secs, result, fingerprint
+                        )
+                else:
+                    result, first = saved
+                    _check_fingerprint(key, fingerprint, first)
+                    self.completed.put(key, saved, ttl_secs)
+            inflight.set_result(result)
+            return result, replayed
+        except asyncio.CancelledError:
+            inflight.cancel()
+            raise
+        except BaseException as e:
+            inflight.set_exception(e)
+            inflight.exception()  # retrieved, even if no duplicate was waiting
+            raise
+        finally:
+            del self._inflight_async[key]
+
+    def sweep(self) -> None:
+        """Drop expired results, in memory and in the coordination directory."""
+        self.completed.sweep()
+        now = time.time()
+        for path in self.results_dir.glob("*.json"):
+            try:
+                if json.loads(path.read_text(encoding="utf-8"))["expires"] < now:
+                    path.unlink(missing_ok=True)
+            except (OSError, ValueError, KeyError):
+                continue
+
+    def _result_file(self, key: str) -> Path:
+        return self.results_dir / f"{safe_name(key)}.json"
+
+    def _disk_get(self, key: str) -> Optional[tuple[Result, Optional[str]]]:
+        path = self._result_file(key)
+        try:
+            saved = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if saved["expires"] < time.time():
+            path.unlink(missing_ok=True)
+            return None
+        return (saved["body"], saved["status"]), saved.get("fingerprint")
+
+    def _store(
+        self, key: str, ttl_secs: float, result: Result, fingerprint: Optional[str] = None
+    ) -> None:
+        expires = time.time() + ttl_secs
+        self.completed.put(key, (result, fingerprint), ttl_secs)
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        body, status = result
+        saved = {"expires": expires, "body": body, "status": status, "fingerprint": fingerprint}
+        atomic_write_text(self._result_file(key), json.dumps(saved))
@@ -0,0 +1,228 @@
+"""A cached index of the notes directory for zotero_to_obsidian_note_receiver.py.
+
+Listing a vault with tens of thousands of notes on every /status call took seconds (worse on cloud
+drives), so the receiver keeps one scandir snapshot (name -> mtime, size) and only rescans when the
+directory's own mtime changes (a note was added, removed or renamed) or the snapshot is older than
+max_age_secs (catches edits to existing notes).  Notes the receiver writes itself are recorded directly.
+
+Given an on_change callback, the index reports what changed: each note the receiver records, and what
+a rescan finds added, modified or deleted since the previous snapshot (see receiver_changes.py)."""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional, Union
+
+from receiver_changes import ADDED, DELETED, MODIFIED
+
+logger = logging.getLogger(__name__)
+
+
+class NoteEntry(NamedTuple):
+    name: str
+    mtime: float
+    size: int
+
+    def as_dict(self) -> dict:
+        return {"name": self.name, "mtime": self.mtime, "size": self.size}
+
+
+# on_change(change, name, mtime, size, source), e.g. ChangeFeed.publish
+ChangeCallback = Callable[[str, str, Optional[float], Optional[int], str], None]
+
+
+class NoteIndex:
+    """Snapshot of the files in one notes directory.  Thread safe."""
+
+    def __init__(
+        self, notes_dir: Path, max_age_secs: float = 30, on_change: Optional[ChangeCallback] = None
+    ):
+        self.notes_dir = Path(notes_dir)
+        self.max_age_secs = max_age_secs
+        self.on_change = on_change
+
+        self._lock = threading.Lock()
+        self._entries: dict[str, NoteEntry] = {}
+        self._sorted_names: Optional[list[str]] = None  # rebuilt lazily after changes
+        self._dir_mtime: Optional[float] = None
+        self._scanned_at: Optional[float] = None  # time.time() of the last full scan
+        self._scanning = False
+
+    # Keeping the snapshot fresh
+
+    def _current_dir_mtime(self) -> Optional[float]:
+        try:
+            return self.notes_dir.stat().st_mtime
+        except OSError:
+            return None
+
+    def is_stale(self, max_age_secs: Optional[float] = None) -> bool:
+        if self._scanned_at is None:
+            return True
+        max_age_secs = self.max_age_secs if max_age_secs is None else max_age_secs
+        if time.time() - self._scanned_at > max_age_secs:
+            return True
+        return self._current_dir_mtime() != self._dir_mtime
+
+    def refresh(self, block: bool = True, max_age_secs: Optional[float] = None) -> None:
+        """Rescan if stale.  With block=False (and a snapshot already there) the rescan runs in the
+        background and callers keep using the current snapshot meanwhile.  max_age_secs overrides
+        the index's own, e.g. to catch edits sooner while a client is waiting for changes."""
+        if not self.is_stale(max_age_secs):
+            return
+        if block or self._scanned_at is None:
+            self._scan()
+            return
+        self._scan_in_background()
+
+    def _scan_in_background(self) -> None:
+        with self._lock:
+            if self._scanning:
+                return
+            self._scanning = True
+        threading.Thread(target=self._scan, name="note-index-scan", daemon=True).start()
+
+    def _scan(self) -> None:
+        started = time.time()
+        dir_mtime = self._current_dir_mtime()
+        entries = {}
+        try:
+            with os.scandir(self.notes_dir) as it:
+                for entry in it:
+                    try:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            entries[entry.name] = NoteEntry(entry.name, stat.st_mtime, stat.st_size)
+                    except OSError:
+                        continue  # deleted while scanning
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Could not scan notes directory %s: %s", self.notes_dir, e)
+
+        with self._lock:
+            changes = self._diff(self._entries, entries) if self._scanned_at is not None else []
+            self._entries = entries
+            self._sorted_names = None
+            self._dir_mtime = dir_mtime
+            self._scanned_at = started
+            self._scanning = False
+        logger.debug("Indexed %d notes in %.3fs", len(entries), time.time() - started)
+        for change, entry in changes:
+            self._report(change, entry, "scan")
+
+    def _diff(
+        self, old: dict[str, NoteEntry], new: dict[str, NoteEntry]
+    ) -> list[tuple[str, NoteEntry]]:
+        """What changed between two snapshots.  Updates new for notes the scan missed."""
+        if self.on_change is None:
+            return []
+        changes = []
+        for name, entry in new.items():
+            previous = old.get(name)
+            if previous is None:
+                changes.append((ADDED, entry))
+            elif (entry.mtime, entry.size) != (previous.mtime, previous.size):
+                changes.append((MODIFIED, entry))
+        for name, entry in old.items():
+            if name not in new:
+                if (self.notes_dir / name).exists():
+                    new[name] = entry  # written (by record_write) after the scan listed the directory
+                else:
+                    changes.append((DELETED, entry))
+        return changes
+
+    def _report(self, change: str, entry: NoteEntry, source: str) -> None:
+        if self.on_change is None:
+            return
+        if change == DELETED:
+            self.on_change(change, entry.name, None, None, source)
+        else:
+            self.on_change(change, entry.name, entry.mtime, entry.size, source)
+
+    def record_write(self, filepath: Union[str, Path]) -> None:
+        """Note that the receiver wrote filepath, without rescanning the whole directory."""
+        filepath = Path(filepath)
+        try:
+            stat = filepath.stat()
+        except OSError:
+            return
+        entry = NoteEntry(filepath.name, stat.st_mtime, stat.st_size)
+        with self._lock:
+            is_new = filepath.name not in self._entries
+            if is_new:
+                self._sorted_names = None
+            self._entries[filepath.name] = entry
+            # our own write bumped the directory mtime; don't let that alone force a rescan
+            if self._scanned_at is not None:
+                self._dir_mtime = self._current_dir_mtime()
+        self._report(ADDED if is_new else MODIFIED, entry, "receiver")
+
+    # Queries
+
+    def __contains__(self, name: str) -> bool:
+        self.refresh()
+        return name in self._entries
+
+    def present(self, names: Iterable[str]) -> set[str]:
+        """The names that are in the directory, with one freshness check for all of them.  A stale
+        snapshot isn't rescanned on the caller's time: the names are checked on disk one by one,
+        and the rescan runs in the background."""
+        if not self.is_stale():
+            with self._lock:
+                return {name for name in names if name in self._entries}
+        self._scan_in_background()
+        return {name for name in names if (self.notes_dir / name).is_file()}
+
+    def summary(self) -> dict:
+        """Note count, directory mtime and index age, without waiting on a rescan."""
+        self.refresh(block=False)
+        with self._lock:
+            return {
+                "note_count": len(self._entries),
+                "dir_mtime": self._dir_mtime,
+                "index_age_secs": None
+                if self._scanned_at is None
+                else round(time.time() - self._scanned_at, 3),
+                "rescanning": self._scanning,
+            }
+
+    def _names(self) -> list[str]:
+        with self._lock:
+            if self._sorted_names is None:
+                self._sorted_names = sorted(self._entries)
+            return self._sorted_names
+
+    def iter_entries(
+        self, prefix: str = "", modified_since: Optional[float] = None, after: str = ""
+    ) -> Iterator[NoteEntry]:
+        """Entries in name order, filtered by name prefix and mtime, starting after name `after`."""
+        self.refresh()
+        names = self._names()
+        entries = self._entries
+        start = max(bisect.bisect_right(names, after) if after else 0, bisect.bisect_left(names, prefix))
+        for name in names[start:]:
+            if not name.startswith(prefix):
+                break  # sorted, so no later name has the prefix either
+            entry = entries.get(name)
+            if entry is None or (modified_since is not None and entry.mtime < modified_since):
+                continue
+            yield entry
+
+    def page(
+        self,
+        prefix: str = "",
+        modified_since: Optional[float] = None,
+        cursor: str = "",
+        limit: int = 500,
+    ) -> tuple[list[NoteEntry], Optional[str]]:
+        """One page of entries, and the cursor for the next page (None at the end)."""
+        page = []
+        for entry in self.iter_entries(prefix, modified_since, after=cursor):
+            if len(page) == limit:
+                return page, page[-1].name
+            page.append(entry)
+        return page, None
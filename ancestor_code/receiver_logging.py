@@ -0,0 +1,184 @@
+"""Logging for zotero_to_obsidian_note_receiver.py that stays off the request hot path.
+
+- Request threads only put records on a queue; a listener thread formats them and does the file and
+  console I/O.  Messages use logging's lazy %-style arguments, so nothing is formatted for records
+  whose level is filtered out, and what is formatted is formatted by the listener.
+- The log file holds one JSON object per line, with request_id and citekey fields taken from the
+  request context (see log_context), and rotates by size.
+- Long messages and payloads are truncated (see truncate)."""
+
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import reprlib
+import time
+from typing import Any, Iterator, Optional, Union
+
+# Per-request context attached to every record logged while it's set
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+citekey_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("citekey", default=None)
+
+MAX_MESSAGE_CHARS = 2000
+MAX_PAYLOAD_CHARS = 300
+
+
+class _Truncated:
+    """A log argument that is only turned into a (shortened) string if the record is emitted."""
+
+    def __init__(self, value: Any, limit: int):
+        self.value = value
+        self.limit = limit
+        # keep a snapshot of mutable payloads: they may change before the listener formats them
+        self.text = _bounded_repr(value, limit) if isinstance(value, (dict, list)) else None
+
+    def __str__(self) -> str:
+        text = self.text if self.text is not None else str(self.value)
+        if len(text) > self.limit:
+            return f"{text[: self.limit]}... [truncated]"
+        return text
+
+
+def _bounded_repr(value: Union[dict, list], limit: int) -> str:
+    """repr(value), cut short as it's built: a few levels, items and limit chars per string, so a
+    payload with megabytes of note HTML costs no more than a small one."""
+    bounded = reprlib.Repr()
+    bounded.maxlevel = 3
+    bounded.maxdict = bounded.maxlist = bounded.maxtuple = bounded.maxset = 8
+    bounded.maxstring = bounded.maxother = limit
+    return bounded.repr(value)[: limit + 1]
+
+
+def truncate(value: Any, limit: int = MAX_PAYLOAD_CHARS) -> _Truncated:
+    """Wrap a log argument (e.g. a whole item payload with its note HTML) so it's cut to limit chars."""
+    return _Truncated(value, limit)
+
+
+@contextlib.contextmanager
+def log_context(request_id: Optional[str] = None, citekey: Optional[str] = None) -> Iterator[None]:
+    """Tag every record logged inside the with block with this request_id and/or citekey."""
+    tokens = []
+    if request_id is not None:
+        tokens.append((request_id_var, request_id_var.set(request_id)))
+    if citekey is not None:
+        tokens.append((citekey_var, citekey_var.set(citekey)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class _ContextFilter(logging.Filter):
+    """Copies the request context onto records, in the logging thread, before they're queued."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        if not hasattr(record, "citekey"):
+            record.citekey = citekey_var.get()
+        return True
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """Queues records unformatted.  The stock QueueHandler formats in the caller's thread, so that
+    records can be pickled; ours never leave the process."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            # render now: the traceback's frames would otherwise stay alive in the queue
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, request_id, citekey (and exc)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created))
+            + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": _shorten(record.getMessage()),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        if getattr(record, "citekey", None):
+            entry["citekey"] = record.citekey
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """Human-readable console lines, with the request_id up front when there is one."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        request_id = getattr(record, "request_id", None)
+        prefix = f"[{request_id}] " if request_id else ""
+        line = f"{self.formatTime(record)} - {record.levelname} - {prefix}{_shorten(record.getMessage())}"
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+def _shorten(message: str) -> str:
+    if len(message) > MAX_MESSAGE_CHARS:
+        return f"{message[:MAX_MESSAGE_CHARS]}... [truncated {len(message) - MAX_MESSAGE_CHARS} chars]"
+    return message
+
+
+def configure_logging(
+    log_file: str,
+    level: Union[str, int] = "INFO",
+    logger_levels: Optional[dict[str, Union[str, int]]] = None,
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    console: bool = True,
+) -> logging.handlers.QueueListener:
+    """Route all logging through a queue to a rotating JSON log file (and the console).
+    Returns the started listener; call its stop() at shutdown to flush the queue."""
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+    )
+    file_handler.setFormatter(JsonFormatter())
+    handlers: list[logging.Handler] = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(ConsoleFormatter())
+        handlers.append(console_handler)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _LazyQueueHandler(log_queue)
+    queue_handler.addFilter(_ContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    set_log_levels(level, logger_levels)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def logging_configured() -> bool:
+    """True if configure_logging() has set up this process's logging."""
+    return any(isinstance(handler, _LazyQueueHandler) for handler in logging.getLogger().handlers)
+
+
+def set_log_levels(
+    level: Union[str, int], logger_levels: Optional[dict[str, Union[str, int]]] = None
+) -> None:
+    """Set the root level, and any per-logger overrides (e.g. {"waitress": "WARNING"})."""
+    logging.getLogger().setLevel(level.upper() if isinstance(level, str) else level)
+    for name, logger_level in (logger_levels or {}).items():
+        logging.getLogger(name).setLevel(
+            logger_level.upper() if isinstance(logger_level, str) else logger_level
+        )
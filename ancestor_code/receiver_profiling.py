@@ -0,0 +1,196 @@
+"""On-demand and slow-request profiling for zotero_to_obsidian_note_receiver.py.
+
+Two ways a request gets profiled, both saved in the profiles directory under the request_id:
+- Asked for (X-Profile: 1 header or ?profile=1, see profile_asked()): the whole request runs under
+  cProfile, saved as <request_id>.pstats (view with snakeviz, or turn into a flamegraph with
+  flameprof).  One request at a time: a request asking while another is profiled runs unprofiled
+  (Python 3.12+ allows one active profiler, and profiles every thread with it, so such a profile
+  can also show other requests' work).
+- Slower than slow_threshold_secs: a sampler thread starts taking stack samples of the request's
+  thread once it passes the threshold, saved as <request_id>.collapsed, the folded-stack format that
+  flamegraph.pl and speedscope read.  Faster requests only pay for a dict insert and delete.
+
+With neither, profile() costs nothing."""
+
+import contextlib
+import cProfile
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SUFFIXES = (".pstats", ".collapsed")
+# values of the X-Profile header or ?profile= that ask for a profile; anything else (0, false, ...)
+# doesn't
+PROFILE_YES = ("1", "true", "yes", "on")
+
+
+def profile_asked(*values: Optional[str]) -> bool:
+    """True if any of values (the X-Profile header, the profile query argument) says yes."""
+    return any(value and value.strip().lower() in PROFILE_YES for value in values)
+
+
+class _Watched:
+    def __init__(self, thread_id: int, started: float):
+        self.thread_id = thread_id
+        self.started = started
+        self.samples: Counter[str] = Counter()
+
+
+class RequestProfiler:
+    """Captures profiles of requests and keeps the newest max_profiles of them."""
+
+    def __init__(
+        self,
+        profiles_dir: Path,
+        slow_threshold_secs: Optional[float] = None,
+        sample_interval_secs: float = 0.01,
+        max_profiles: int = 200,
+    ):
+        self.profiles_dir = Path(profiles_dir)
+        self.slow_threshold_secs = slow_threshold_secs
+        self.sample_interval_secs = sample_interval_secs
+        self.max_profiles = max_profiles
+
+        self._watched: dict[str, _Watched] = {}
+        self._watched_lock = threading.Lock()
+        self._have_watched = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._cprofile_lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def profile(self, request_id: str, requested: bool = False) -> Iterator[None]:
+        """Profile the with block if requested, or sample it if it runs slow."""
+        if requested and not self._cprofile_lock.acquire(blocking=False):
+            logger.warning("Another request is being profiled, so not profiling this one")
+            requested = False
+        if requested:
+            try:
+                with self._cprofile(request_id):
+                    yield
+            finally:
+                self._cprofile_lock.release()
+        elif self.slow_threshold_secs is not None:
+            with self._watch(request_id):
+                yield
+        else:
+            yield
+
+    @contextlib.contextmanager
+    def _cprofile(self, request_id: str) -> Iterator[None]:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:  # another profiler (a debugger, say) is active, from Python 3.12
+            logger.warning("Not profiling this request: %s", e)
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = self._new_profile_path(request_id, ".pstats")
+            profiler.dump_stats(str(path))
+            logger.info("Saved requested profile %s", path.name)
+
+    @contextlib.contextmanager
+    def _watch(self, request_id: str) -> Iterator[None]:
+        self._start_sampler()
+        watched = _Watched(threading.get_ident(), time.perf_counter())
+        with self._watched_lock:
+            self._watched[request_id] = watched
+            self._have_watched.set()
+        try:
+            yield
+        finally:
+            with self._watched_lock:
+                del self._watched[request_id]
+                if not self._watched:
+                    self._have_watched.clear()
+            samples = dict(watched.samples)  # one copy; the sampler may still be adding one
+            if samples:
+                elapsed = time.perf_counter() - watched.started
+                path = self._new_profile_path(request_id, ".collapsed")
+                path.write_text(
+                    "".join(f"{stack} {count}\n" for stack, count in samples.items()),
+                    encoding="utf-8",
+                )
+                logger.info("Slow request (%.2fs), saved samples %s", elapsed, path.name)
+
+    def _start_sampler(self) -> None:
+        if self._sampler is None or not self._sampler.is_alive():
+            with self._watched_lock:
+                if self._sampler is None or not self._sampler.is_alive():
+                    self._sampler = threading.Thread(
+                        target=self._sample_forever, name="slow-request-sampler", daemon=True
+                    )
+                    self._sampler.start()
+
+    def _sample_forever(self) -> None:
+        while True:
+            self._have_watched.wait()  # idle until some request is running
+            time.sleep(self.sample_interval_secs)
+            now = time.perf_counter()
+            with self._watched_lock:
+                slow = [w for w in self._watched.values() if now - w.started >= self.slow_threshold_secs]
+            if not slow:
+                continue
+            frames = sys._current_frames()
+            for watched in slow:
+                if (frame := frames.get(watched.thread_id)) is not None:
+                    watched.samples[_folded_stack(frame)] += 1
+
+    # Saved profiles
+
+    def _new_profile_path(self, request_id: str, suffix: str) -> Path:
+        self.profiles_dir.mkdir(parents=True, exist_ok=True)
+        self._prune()
+        return self.profiles_dir / f"{request_id}{suffix}"
+
+    def _prune(self) -> None:
+        profiles = sorted(self._profile_files(), key=lambda p: p.stat().st_mtime)
+        for path in profiles[: max(0, len(profiles) - self.max_profiles + 1)]:
+            path.unlink(missing_ok=True)
+
+    def _profile_files(self) -> list[Path]:
+        if not self.profiles_dir.is_dir():
+            return []
+        return [p for p in self.profiles_dir.iterdir() if p.suffix in PROFILE_SUFFIXES]
+
+    def list_profiles(self) -> list[dict]:
+        """Saved profiles, newest first."""
+        listing = []
+        for path in self._profile_files():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            listing.append(
+                {
+                    "name": path.name,
+                    "request_id": path.stem,
+                    "kind": "cprofile" if path.suffix == ".pstats" else "sampled",
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                }
+            )
+        return sorted(listing, key=lambda p: p["mtime"], reverse=True)
+
+    def has_profile(self, name: str) -> bool:
+        """True if name is one of the saved profiles (and nothing else, like a path)."""
+        return any(p.name == name for p in self._profile_files())
+
+
+def _folded_stack(frame) -> str:
+    """One stack as 'outer;...;inner', each frame as file:function."""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{Path(code.co_filename).name}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
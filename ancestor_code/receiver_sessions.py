@@ -0,0 +1,127 @@
+"""Bounded, self-expiring registries for the receiver's long-lived state (dialog sessions, replayable
+webhook results), so that a receiver left running for weeks keeps flat memory.
+
+Every entry has a TTL and the registry a maximum size.  Expired entries are dropped lazily when touched
+and by a background sweep; when full, the oldest entry is evicted."""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiringRegistry:
+    """A dict-like registry with a size bound and per-entry TTL.  Thread safe."""
+
+    def __init__(self, name: str, max_entries: int, default_ttl_secs: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.default_ttl_secs = default_ttl_secs
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()  # key -> (expires, value)
+        self._added = 0
+        self._expired = 0
+        self._evicted = 0
+
+    def put(self, key: str, value: Any, ttl_secs: Optional[float] = None) -> None:
+        expires = time.monotonic() + (self.default_ttl_secs if ttl_secs is None else ttl_secs)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            self._added += 1
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._evicted += 1
+                logger.debug("%s: evicted %s (registry full)", self.name, evicted_key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                self._expired += 1
+                return default
+            return entry[1]
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keys(self) -> list[str]:
+        """The live keys, oldest first."""
+        self.sweep()
+        with self._lock:
+            return list(self._entries)
+
+    def sweep(self) -> int:
+        """Drop every expired entry.  Returns how many were dropped."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (expires, _) in self._entries.items() if expires <= now]
+            for key in expired:
+                del self._entries[key]
+            self._expired += len(expired)
+        return len(expired)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "live": len(self._entries),
+                "max_entries": self.max_entries,
+                "added": self._added,
+                "expired": self._expired,
+                "evicted": self._evicted,
+            }
+
+
+_MISSING = object()
+
+
+class Sweeper:
+    """One daemon thread that periodically runs every registered cleanup function."""
+
+    def __init__(self, interval_secs: float):
+        self.interval_secs = interval_secs
+        self._tasks: list[Callable[[], Any]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.sweeps = 0
+
+    def register(self, task: Callable[[], Any]) -> None:
+        self._tasks.append(task)
+
+    def start(self) -> None:
+        """Start sweeping.  Safe to call more than once; call it after any fork."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="registry-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_once(self) -> None:
+        for task in self._tasks:
+            try:
+                task()
+            except Exception:
+                logger.exception("Sweep task %s failed", task)
+        self.sweeps += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_secs):
+            self.run_once()
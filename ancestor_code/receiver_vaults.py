@@ -0,0 +1,284 @@
+"""The Obsidian vaults zotero_to_obsidian_note_receiver.py writes into, and routing payloads to them.
+
+One receiver can serve several vaults (personal, project, shared, ...).  A payload names its vault by
+vault_id: a `vault_id` payload field, an `X-Vault-Id` header or a `?vault=` query argument.  Payloads
+without one go to the default vault.  Each vault has its own:
+- coordination directory (note locks, dialog answers, replayable results) and idempotency cache,
+- note index, and the feed of note changes it reports (see receiver_changes.py),
+- Obsidian plugin-config cache,
+- limit on the writes it has in progress.  A big export into one vault is turned away (VaultBusy,
+  HTTP 503) once the vault is at its limit, instead of taking every server thread away from the other
+  vaults.  Under waitress, where a request holds its server thread until done, the limit is the
+  vault's share of the server threads (VaultRegistry.share_threads).  In the asyncio mode writes hold
+  no server thread: they queue, up to max_pending, for the vault's own worker pool.
+
+The vaults file is JSON, e.g.
+
+    {"default": "personal",
+     "vaults": {
+        "personal": {"root": "~/Obsidian/Personal", "notes_path": "lit/lit_notes"},
+        "project": {"root": "//server/share/Project Vault", "notes_path": "refs", "workers": 4}}}
+
+Besides root and notes_path, a vault can set coord_dir, workers, max_pending, max_changes and
+change_scan_secs."""
+
+import asyncio
+import contextlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+import open_obsidian_note_by_uri as onu
+from receiver_changes import ChangeFeed
+from receiver_coordination import Coordinator, local_coord_dir
+from receiver_idempotency import IdempotencyCache
+from receiver_index import NoteIndex
+
+logger = logging.getLogger(__name__)
+
+VAULT_ID_HEADER = "X-Vault-Id"
+VAULT_ID_PAYLOAD_FIELD = "vault_id"
+VAULT_ID_QUERY_ARG = "vault"
+
+DEFAULT_VAULT_ID = "default"
+
+
+class UnknownVault(KeyError):
+    """Raised for a vault_id that isn't configured."""
+
+    def __str__(self) -> str:
+        return str(self.args[0]) if self.args else super().__str__()
+
+
+class VaultBusy(RuntimeError):
+    """Raised when a vault already has as many writes in progress as it may (503)."""
+
+
+def vault_id_of(headers, args, payload: Optional[dict] = None) -> Optional[str]:
+    """The vault a request is for: payload field, then header, then query argument (None: default)."""
+    if isinstance(payload, dict) and payload.get(VAULT_ID_PAYLOAD_FIELD):
+        return str(payload[VAULT_ID_PAYLOAD_FIELD])
+    return headers.get(VAULT_ID_HEADER) or args.get(VAULT_ID_QUERY_ARG) or None
+
+
+class Vault:
+    """One vault: where its notes go, and the per-vault state the receiver keeps for it."""
+
+    def __init__(
+        self,
+        vault_id: str,
+        root: Union[str, Path],
+        notes_path: str,
+        coord_dir: Union[str, Path, None] = None,
+        workers: int = 2,
+        max_pending: int = 32,
+        dialog_ttl_secs: float = 300,
+        max_dialogs: int = 256,
+        max_results: int = 1000,
+        results_ttl_secs: float = 120,
+        index_max_age_secs: float = 30,
+        max_changes: int = 10000,
+        change_scan_secs: float = 10,
+    ):
+        self.vault_id = vault_id
+        self.root = Path(root).expanduser()
+        self.notes_path = notes_path.strip("/")
+        self.notes_dir = self.root / self.notes_path
+        self.workers = workers
+        self.max_pending = max_pending
+        # under waitress, the most server threads this vault's writes may hold (see share_threads)
+        self.thread_share: Optional[int] = None
+
+        # by default on local disk: a synced vault would sync the lock files without carrying the locks
+        self.coord = Coordinator(
+            Path(coord_dir).expanduser() if coord_dir else local_coord_dir(str(self.root.absolute())),
+            dialog_ttl_secs=dialog_ttl_secs,
+            max_dialogs=max_dialogs,
+        )
+        self.idempotency = IdempotencyCache(
+            self.coord, max_entries=max_results, default_ttl_secs=results_ttl_secs
+        )
+        self.changes = ChangeFeed(max_changes)
+        self.change_scan_secs = change_scan_secs
+        self.note_index = NoteIndex(
+            self.notes_dir, max_age_secs=index_max_age_secs, on_change=self.changes.publish
+        )
+
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"Vault({self.vault_id!r}, {str(self.root)!r}, {self.notes_path!r})"
+
+    def note_path(self, citekey: str) -> str:
+        """The note's path within the vault, as Obsidian names it."""
+        return f"{self.notes_path}/{citekey}.md" if self.notes_path else f"{citekey}.md"
+
+    def note_file(self, citekey: str) -> Path:
+        return self.root / self.note_path(citekey)
+
+    # The write limit, and the worker pool of the asyncio mode
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._pending_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        self.workers, thread_name_prefix=f"vault-{self.vault_id}"
+                    )
+        return self._pool
+
+    @property
+    def max_in_progress(self) -> int:
+        if self.thread_share is None:
+            return self.max_pending
+        return min(self.max_pending, self.thread_share)
+
+    @contextlib.contextmanager
+    def admit(self) -> Iterator[None]:
+        """Hold one of the vault's max_in_progress places for a write.  Raises VaultBusy if there's
+        none."""
+        with self._pending_lock:
+            if self._pending >= self.max_in_progress:
+                raise VaultBusy(
+                    f"Vault {self.vault_id} is busy ({self._pending} writes in progress), try again later"
+                )
+            self._pending += 1
+        try:
+            yield
+        finally:
+            with self._pending_lock:
+                self._pending -= 1
+
+    # The change feed
+
+    def wait_changes(self, cursor: Optional[str], timeout: float, limit: int = 500) -> dict:
+        """ChangeFeed.since(cursor), waiting up to timeout for something to report.  While waiting,
+        the notes directory is rescanned every change_scan_secs, for changes made outside the receiver."""
+        deadline = time.monotonic() + timeout
+        while True:
+            self.note_index.refresh(block=False, max_age_secs=self.change_scan_secs)
+            remaining = deadline - time.monotonic()
+            if self.changes.wait(cursor, min(self.change_scan_secs, max(0.0, remaining))):
+                break
+            if remaining <= self.change_scan_secs:
+                break
+        return self.changes.since(cursor, limit)
+
+    async def wait_changes_async(
+        self, cursor: Optional[str], timeout: float, limit: int = 500
+    ) -> dict:
+        """wait_changes() on the event loop, holding no thread while it waits."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            await loop.run_in_executor(
+                None, lambda: self.note_index.refresh(block=False, max_age_secs=self.change_scan_secs)
+            )
+            remaining = deadline - loop.time()
+            if await self.changes.wait_async(cursor, min(self.change_scan_secs, max(0.0, remaining))):
+                break
+            if remaining <= self.change_scan_secs:
+                break
+        return self.changes.since(cursor, limit)
+
+    # Housekeeping
+
+    def preload(self) -> None:
+        """Build the note index and read the plugin config now, so the first request doesn't."""
+        self.coord.ensure_dirs()
+        self.note_index.refresh()
+        onu.preload_vault_config(self.root)
+
+    def sweep(self) -> None:
+        self.coord.sweep()
+        self.idempotency.sweep()
+
+    def stats(self) -> dict:
+        return {
+            "root": str(self.root),
+            "notes_path": self.notes_path,
+            "workers": self.workers,
+            "in_progress": self._pending,
+            "max_in_progress": self.max_in_progress,
+            "changes": self.changes.stats(),
+        }
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        onu.forget_vault_config(self.root)
+
+
+class VaultRegistry:
+    """The configured vaults, by vault_id, and which one is the default."""
+
+    def __init__(self, vaults: list[Vault], default_id: Optional[str] = None):
+        if not vaults:
+            raise ValueError("At least one vault must be configured")
+        self._vaults = {vault.vault_id: vault for vault in vaults}
+        self.default_id = default_id or vaults[0].vault_id
+        if self.default_id not in self._vaults:
+            raise ValueError(f"Default vault {self.default_id!r} isn't configured")
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path], **vault_defaults) -> "VaultRegistry":
+        """Load a vaults file (see the module docstring).  vault_defaults apply to every vault."""
+        config = json.loads(Path(path).read_text(encoding="utf-8"))
+        vaults = [
+            Vault(vault_id, **dict(vault_defaults, **settings))
+            for vault_id, settings in config["vaults"].items()
+        ]
+        registry = cls(vaults, config.get("default"))
+        logger.info("Loaded %d vault(s) from %s: %s", len(vaults), path, ", ".join(registry.ids()))
+        return registry
+
+    def get(self, vault_id: Optional[str] = None) -> Vault:
+        """The vault with this id, or the default vault for None."""
+        try:
+            return self._vaults[vault_id or self.default_id]
+        except KeyError:
+            raise UnknownVault(f"Unknown vault_id {vault_id!r}, expected one of {self.ids()}") from None
+
+    @property
+    def default(self) -> Vault:
+        return self._vaults[self.default_id]
+
+    def ids(self) -> list[str]:
+        return list(self._vaults)
+
+    def __iter__(self) -> Iterator[Vault]:
+        return iter(list(self._vaults.values()))
+
+    def __len__(self) -> int:
+        return len(self._vaults)
+
+    def share_threads(self, threads: int) -> int:
+        """Split threads (the server threads writes may hold) evenly between the vaults, for servers
+        like waitress where a request holds its thread while it waits: a busy vault then answers
+        503 once it holds its share, and can't take the threads the other vaults' writes need.
+        Returns the share."""
+        share = max(1, threads // len(self))
+        if share * len(self) > threads:
+            logger.warning(
+                "%d vaults share %d server threads: a busy vault can still hold up the others",
+                len(self),
+                threads,
+            )
+        for vault in self:
+            vault.thread_share = share
+        return share
+
+    def sweep(self) -> None:
+        for vault in self:
+            vault.sweep()
+
+    def close(self) -> None:
+        for vault in self:
+            vault.close()
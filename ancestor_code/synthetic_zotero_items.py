@@ -0,0 +1,188 @@
+"""Seeded generator of realistic zotero item payloads, shaped like the ones zotero_to_obsidian_note_sender.js
+sends, for benchmarking and load testing zotero_to_obsidian_note_receiver.py.
+
+Notes are Zotero note HTML with what the receiver's converter has to handle: headings, paragraphs with
+nested highlight/bold/italic style spans, links, blockquotes, lists and data-citation spans.  Items have
+many creators, tags, collections and attachments.  The same seed always gives the same items."""
+
+import json
+import random
+import string
+import urllib.parse
+from typing import Optional
+
+_WORDS = (
+    "attention model network graph latent causal bayesian inference sparse robust transformer "
+    "retrieval memory planning policy gradient estimator variance kernel manifold embedding "
+    "benchmark dataset protocol trial cohort survey regression signal spectrum climate energy "
+    "protein binding enzyme cell tissue neural cortex decision market price risk portfolio"
+).split()
+_LAST_NAMES = "Smith Nguyen Garcia Müller Rossi Kowalski Tanaka Okafor Silva Dubois Novak Larsen Kim".split()
+_FIRST_NAMES = "Ana Ben Chen Dara Emil Fatima Goran Hana Ivan Jun Kemal Lena Mateo Noor Olu".split()
+_CREATOR_TYPES = ("author", "author", "author", "editor", "contributor")
+_ITEM_TYPES = ("journalArticle", "conferencePaper", "book", "bookSection", "report", "preprint")
+_ATTACHMENT_EXTENSIONS = (".pdf", ".pdf", ".html", ".docx", ".pptx", ".epub", ".txt")
+_HIGHLIGHT_COLORS = ("#ffd40080", "#ff666680", "#5fb23680", "#2ea8e580", "#a28ae580")
+
+
+def _words(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(low, high)))
+
+
+def _itemkey(rng: random.Random) -> str:
+    return "".join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(8))
+
+
+def _citation_span(rng: random.Random) -> str:
+    """A Zotero citation span, with its URL-encoded data-citation JSON."""
+    key = _itemkey(rng)
+    citation = {
+        "citationItems": [{"uris": [f"http://zotero.org/users/1234567/items/{key}"]}],
+        "properties": {},
+    }
+    data = urllib.parse.quote(json.dumps(citation))
+    label = f"{rng.choice(_LAST_NAMES)}, {rng.randint(1990, 2025)}"
+    return (
+        f'<span class="citation" data-citation="{data}">'
+        f'(<span class="citation-item">{label}</span>)</span>'
+    )
+
+
+def _inline(rng: random.Random, depth: int = 0) -> str:
+    """A run of text with nested inline formatting."""
+    parts = []
+    for _ in range(rng.randint(2, 6)):
+        kind = rng.random()
+        text = _words(rng, 2, 12)
+        if depth < 2 and kind < 0.15:
+            color = rng.choice(_HIGHLIGHT_COLORS)
+            parts.append(f'<span style="background-color: {color}">{_inline(rng, depth + 1)}</span>')
+        elif kind < 0.25:
+            parts.append(f'<span style="font-weight: bold">{text}</span>')
+        elif kind < 0.32:
+            parts.append(f'<span style="font-style: italic">{text}</span>')
+        elif kind < 0.40:
+            parts.append(f"<strong>{text}</strong>")
+        elif kind < 0.46:
+            parts.append(f"<em>{text}</em>")
+        elif kind < 0.52:
+            parts.append(f'<a href="https://example.org/{rng.randint(1, 9999)}">{text}</a>')
+        elif kind < 0.62:
+            parts.append(_citation_span(rng))
+        else:
+            parts.append(text)
+    return " ".join(parts)
+
+
+def make_note_html(rng: random.Random, blocks: int = 12) -> str:
+    """One Zotero note, as the HTML Zotero stores for it."""
+    html = [f"<h1>{_words(rng, 2, 6)}</h1>"]
+    for _ in range(blocks):
+        kind = rng.random()
+        if kind < 0.40:
+            html.append(f"<p>{_inline(rng)}</p>")
+        elif kind < 0.60:
+            quoted = "".join(f"<p>{_inline(rng)}</p>" for _ in range(rng.randint(1, 3)))
+            html.append(f"<blockquote>{quoted}</blockquote>")
+        elif kind < 0.78:
+            items = "".join(f"<li>{_inline(rng)}</li>" for _ in range(rng.randint(2, 6)))
+            html.append(f"<ul>{items}</ul>")
+        elif kind < 0.88:
+            level = rng.randint(2, 4)
+            html.append(f"<h{level}>{_words(rng, 2, 6)}</h{level}>")
+        else:
+            html.append(f"<p><small>{_inline(rng)}</small></p>")
+    return f'<div data-schema-version="9">{"".join(html)}</div>'
+
+
+def make_item(
+    rng: random.Random,
+    citekey: str,
+    notes: int = 3,
+    note_blocks: int = 12,
+    creators: int = 8,
+    tags: int = 15,
+    collections: int = 5,
+    attachments: int = 4,
+) -> dict:
+    """One item payload, as in the sender's itemDataArray."""
+    itemkey = _itemkey(rng)
+    tag_list = [_words(rng, 1, 3) for _ in range(tags)]
+    creator_list = []
+    for _ in range(creators):
+        if rng.random() < 0.1:
+            creator_list.append(
+                {
+                    "creatorType": rng.choice(_CREATOR_TYPES),
+                    "name": f"{_words(rng, 1, 2).title()} Consortium",
+                }
+            )
+        else:
+            creator_list.append(
+                {
+                    "creatorType": rng.choice(_CREATOR_TYPES),
+                    "lastName": rng.choice(_LAST_NAMES),
+                    "firstName": rng.choice(_FIRST_NAMES),
+                }
+            )
+    attachment_list = []
+    for index in range(attachments):
+        extension = rng.choice(_ATTACHMENT_EXTENSIONS)
+        attachment_list.append(
+            {
+                "title": f"Attachment {index + 1}",
+                "path": rf"C:\Users\someone\Zotero\storage\{_itemkey(rng)}\{citekey}_{index}{extension}",
+                "url": "",
+            }
+        )
+    year = rng.randint(1990, 2025)
+    return {
+        "title": _words(rng, 5, 16).capitalize(),
+        "citekey": citekey,
+        "bibliography": (
+            f"{rng.choice(_LAST_NAMES)}, {rng.choice(_FIRST_NAMES)[0]}. ({year}). {_words(rng, 6, 14)}."
+        ),
+        "tags": tag_list,
+        "collections": [_words(rng, 1, 3).title() for _ in range(collections)],
+        "exportDate": f"{year}-06-01 12:00:00",
+        "desktopURI": f"zotero://select/library/items/{itemkey}",
+        "DOI": f"10.{rng.randint(1000, 9999)}/{_itemkey(rng).lower()}",
+        "url": f"https://example.org/papers/{itemkey}",
+        "abstractNote": " ".join(
+            _words(rng, 12, 20).capitalize() + "." for _ in range(rng.randint(3, 8))
+        ),
+        "creators": creator_list,
+        "date": str(year),
+        "itemkey": itemkey,
+        "itemType": rng.choice(_ITEM_TYPES),
+        "publicationTitle": _words(rng, 2, 5).title(),
+        "volume": str(rng.randint(1, 80)),
+        "issue": str(rng.randint(1, 12)),
+        "publisher": f"{rng.choice(_LAST_NAMES)} Press",
+        "place": rng.choice(("London", "New York", "Berlin", "Tokyo", "São Paulo")),
+        "pages": f"{rng.randint(1, 300)}-{rng.randint(301, 600)}",
+        "ISBN": "",
+        "allTags": tag_list,
+        "notes": [make_note_html(rng, note_blocks) for _ in range(notes)],
+        "attachments": attachment_list,
+    }
+
+
+def make_items(count: int, seed: int = 0, prefix: str = "Synth", **item_kwargs) -> list[dict]:
+    """count item payloads with citekeys prefix0000, prefix0001, ...  Deterministic for a seed."""
+    rng = random.Random(seed)
+    return [make_item(rng, f"{prefix}{index:04d}", **item_kwargs) for index in range(count)]
+
+
+def make_payload(
+    items: list[dict],
+    sender_id: str = "zotero_to_obsidian_note",
+    idempotency_key: Optional[str] = None,
+) -> dict:
+    """A /webhook request body.  Open-note requests carry just the citekeys, like
+    open_obsidian_note_sender.js."""
+    data = [item["citekey"] for item in items] if sender_id == "open_obsidian_note" else items
+    payload = {"sender_id": sender_id, "data": data}
+    if idempotency_key:
+        payload["idempotency_key"] = idempotency_key
+    return payload
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the receiver modules are scripts in ancestor_code/, not a package
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
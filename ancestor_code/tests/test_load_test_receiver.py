@@ -0,0 +1,12 @@
+"""Latency percentiles of the load test (load_test_receiver.py)."""
+
+from load_test_receiver import percentile
+
+
+def test_percentile_is_nearest_rank():
+    assert percentile([], 0.5) is None
+    assert percentile([1, 2, 3, 4, 5], 0.5) == 3  # rank ceil(2.5) = 3, not round(2.5) = 2
+    assert percentile([1, 2, 3, 4], 0.5) == 2
+    assert percentile(list(range(1, 101)), 0.95) == 95
+    assert percentile(list(range(1, 11)), 0.99) == 10
+    assert percentile([7], 0.0) == 7
@@ -0,0 +1,57 @@
+"""The asyncio mode writing notes with the waitress app's code (receiver_asgi.py)."""
+
+import asyncio
+import json
+
+import pytest
+
+import receiver_asgi
+import zotero_to_obsidian_note_receiver as receiver
+from receiver_vaults import Vault, VaultRegistry
+
+
+@pytest.fixture
+def vault(tmp_path, monkeypatch):
+    registry = VaultRegistry([Vault("a", tmp_path / "a", "notes", coord_dir=tmp_path / "coord")])
+    monkeypatch.setattr(receiver, "vaults", registry)
+    monkeypatch.setattr(receiver, "open_note_in_new_tab", lambda *args, **kwargs: [])
+    monkeypatch.setattr(receiver.profiler, "profiles_dir", tmp_path / "profiles")
+    yield registry.default
+    registry.close()
+
+
+def _webhook(items: list, **args) -> tuple[int, dict]:
+    body = json.dumps({"sender_id": receiver.SENDER_ID_ZOTERO_TO_OBSIDIAN_NOTE, "data": items})
+    status, response, _ = asyncio.run(
+        receiver_asgi.webhook(receiver_asgi._Headers([]), args, body.encode())
+    )
+    return status, response
+
+
+def _item(citekey: str, title: str = "A title") -> dict:
+    return {"itemkey": f"K-{citekey}", "citekey": citekey, "notes": [], "title": title}
+
+
+def test_overwrite_answers_act_as_in_the_waitress_app(vault, monkeypatch):
+    assert _webhook([_item("Doe2024"), _item("Roe2023")])[0] == 200
+    answers = iter(["overwrite", "skip_all"])
+
+    async def ask_overwrite(vault, citekey, request_id):
+        return next(answers)
+
+    monkeypatch.setattr(receiver_asgi, "ask_overwrite", ask_overwrite)
+    status, response = _webhook(
+        [_item("Doe2024", "New"), _item("Roe2023", "New"), _item("Poe2022", "New")]
+    )
+    # skip_all at the second note leaves it, and the third, alone
+    assert status == 200
+    assert [(i["citekey"], i["status"]) for i in response["items"]] == [("Doe2024", "overwritten")]
+    assert "New" in vault.note_file("Doe2024").read_text(encoding="utf-8")
+    assert "New" not in vault.note_file("Roe2023").read_text(encoding="utf-8")
+    assert not vault.note_file("Poe2022").exists()
+
+
+def test_requested_profile_is_saved(vault):
+    status, response = _webhook([_item("Doe2024")], profile="1")
+    assert status == 200 and response["items"][0]["status"] == "created"
+    assert (receiver.profiler.profiles_dir / f"{response['request_id']}.pstats").is_file()
@@ -0,0 +1,54 @@
+"""Change feed epochs across forked worker processes (receiver_changes.py)."""
+
+import multiprocessing
+
+import pytest
+
+from receiver_changes import ADDED, ChangeFeed
+
+# made before the fork, as the receiver's vaults are made at import, before serve_workers forks
+feed = ChangeFeed()
+
+
+def _report(parent_cursor: str, results) -> None:
+    body = feed.since(parent_cursor)
+    feed.publish(ADDED, "Child2024.md", 1.0, 10, "receiver")
+    results.put((feed.epoch, body["reset"], body["cursor"], feed.since(body["cursor"])["changes"]))
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="workers only fork on posix"
+)
+def test_forked_workers_get_their_own_epoch():
+    feed.publish(ADDED, "Doe2024.md", 1.0, 10, "receiver")
+    parent_cursor = feed.cursor
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    processes = [context.Process(target=_report, args=(parent_cursor, results)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    reports = [results.get(timeout=30) for _ in processes]
+    for process in processes:
+        process.join(30)
+        assert process.exitcode == 0
+
+    epochs = {epoch for epoch, _, _, _ in reports}
+    assert len(epochs) == 2 and feed.epoch not in epochs
+    for epoch, reset, cursor, changes in reports:
+        # the parent's cursor means nothing to a worker, so it gets a reset to the worker's own feed
+        assert reset and cursor == f"{epoch}:0"
+        assert [change["name"] for change in changes] == ["Child2024.md"]
+    # and the parent's feed carries on untouched
+    assert feed.since(parent_cursor)["changes"] == []
+    assert [c["name"] for c in feed.since(f"{feed.epoch}:0")["changes"]] == ["Doe2024.md"]
+
+
+def test_changes_refused_when_workers_share_the_port(monkeypatch):
+    import zotero_to_obsidian_note_receiver as receiver
+
+    client = receiver.app.test_client()
+    assert client.get("/changes?timeout=0").status_code == 200
+    monkeypatch.setattr(receiver, "_port_workers", 2)
+    for path in ("/changes?timeout=0", "/changes/stream"):
+        response = client.get(path)
+        assert response.status_code == 501 and "--workers 1" in response.get_json()["message"]
@@ -0,0 +1,84 @@
+"""Cross-process note locks and duplicate note writes (receiver_coordination.py)."""
+
+import multiprocessing
+import time
+from pathlib import Path
+
+from receiver_coordination import Coordinator
+
+WORKERS = 4
+INCREMENTS = 20
+
+
+def _increment_under_note_lock(coord_dir: Path, counter: Path, start) -> None:
+    coord = Coordinator(coord_dir)
+    start.wait()
+    for _ in range(INCREMENTS):
+        with coord.note_lock("Doe2024", timeout=30):
+            # a read-modify-write that loses updates unless the lock excludes the other processes
+            value = int(counter.read_text())
+            time.sleep(0.001)
+            counter.write_text(str(value + 1))
+
+
+def test_note_lock_excludes_other_processes(tmp_path):
+    counter = tmp_path / "counter"
+    counter.write_text("0")
+    start = multiprocessing.Event()
+    processes = [
+        multiprocessing.Process(
+            target=_increment_under_note_lock, args=(tmp_path / "coord", counter, start)
+        )
+        for _ in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    start.set()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    assert int(counter.read_text()) == WORKERS * INCREMENTS
+
+
+def _write_item(vault_root: Path, item: dict, start, results) -> None:
+    import zotero_to_obsidian_note_receiver as receiver
+    from receiver_vaults import Vault, VaultRegistry
+
+    vault = Vault("default", vault_root, "notes", coord_dir=vault_root / "coord")
+    receiver.vaults = VaultRegistry([vault])
+
+    def no_dialog(*args, **kwargs):
+        raise AssertionError("asked to overwrite a note a duplicate request had just written")
+
+    receiver.ask_overwrite_popup = no_dialog
+    receiver.onu.open_obsidian_note = lambda *args, **kwargs: {}
+    start.wait()
+    records = receiver.write_obsidian_md_note([dict(item)], "dup", vault)
+    results.put([record["status"] for record in records])
+
+
+def test_concurrent_duplicate_writes_create_one_note(tmp_path):
+    import synthetic_zotero_items as synthetic
+
+    item = synthetic.make_items(1, seed=7)[0]
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    # separate sends of the same item: the sender stamps each with its own exportDate
+    processes = [
+        multiprocessing.Process(
+            target=_write_item,
+            args=(tmp_path, dict(item, exportDate=f"19/10/2026, 11:00:0{i}"), start, results),
+        )
+        for i in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    start.set()
+    statuses = sorted(status for _ in processes for status in results.get(timeout=60))
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    assert statuses == ["created"] + ["unchanged"] * (WORKERS - 1)
+    assert [path.name for path in (tmp_path / "notes").iterdir()] == [f"{item['citekey']}.md"]
@@ -0,0 +1,104 @@
+"""Idempotent webhook requests across processes, and the files they leave (receiver_idempotency.py)."""
+
+import multiprocessing
+import time
+from pathlib import Path
+
+import pytest
+
+from receiver_coordination import Coordinator
+from receiver_idempotency import (
+    IdempotencyCache,
+    IdempotencyKeyReused,
+    idempotency_key,
+    payload_fingerprint,
+)
+from receiver_sessions import Sweeper
+
+WORKERS = 4
+
+
+def test_keyed_requests_leave_no_lock_files(tmp_path):
+    coord = Coordinator(tmp_path / "coord")
+    cache = IdempotencyCache(coord, default_ttl_secs=0.2)
+    sweeper = Sweeper(60)
+    sweeper.register(cache.sweep)
+    sweeper.register(coord.sweep)
+
+    for n in range(50):
+        result, replayed = cache.run(f"client:key-{n}", 0.2, lambda: ({"n": n}, 200))
+        assert not replayed
+    with coord.note_lock("Doe2024"):
+        pass
+    sweeper.run_once()
+    assert list(coord.locks_dir.iterdir()) == []
+
+    time.sleep(0.3)
+    sweeper.run_once()
+    assert list(cache.results_dir.iterdir()) == []
+
+
+def _run_duplicate(coord_dir: Path, runs: Path, start, results) -> None:
+    cache = IdempotencyCache(Coordinator(coord_dir))
+
+    def work():
+        with open(runs, "a") as f:
+            f.write("run\n")
+        time.sleep(0.2)
+        return {"status": "success"}, 200
+
+    start.wait()
+    (body, status), replayed = cache.run("client:dup", 60, work)
+    results.put((body, status, replayed))
+
+
+def test_duplicates_in_other_processes_are_replayed(tmp_path):
+    runs = tmp_path / "runs"
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=_run_duplicate, args=(tmp_path / "coord", runs, start, results)
+        )
+        for _ in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    start.set()
+    outcomes = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    assert runs.read_text().count("run") == 1
+    assert sorted(replayed for _, _, replayed in outcomes) == [False] + [True] * (WORKERS - 1)
+    assert all(body == {"status": "success"} for body, _, _ in outcomes)
+
+
+def _payload(export_date: str, title: str = "A title") -> dict:
+    item = {"citekey": "Doe2024", "title": title, "exportDate": export_date}
+    return {"sender_id": "zotero_to_obsidian_note", "data": [item]}
+
+
+def test_double_fired_sends_get_the_same_derived_key():
+    first = idempotency_key({}, _payload("19/10/2026, 11:00:00"))
+    # the sender stamps exportDate per send, so the second of a double-fired pair can be a second on
+    assert idempotency_key({}, _payload("19/10/2026, 11:00:01")) == first
+    assert idempotency_key({}, _payload("19/10/2026, 11:00:01", title="Edited")) != first
+
+
+def test_client_key_reused_with_another_payload_is_refused(tmp_path):
+    cache = IdempotencyCache(Coordinator(tmp_path / "coord"))
+    key = "client:retry-1"
+    first = payload_fingerprint(_payload("11:00:00"))
+    assert cache.run(key, 60, lambda: ({"n": 1}, 200), first) == (({"n": 1}, 200), False)
+    # a retry of the same items is replayed, whenever it was sent
+    again = payload_fingerprint(_payload("11:05:00"))
+    assert cache.run(key, 60, lambda: ({"n": 2}, 200), again) == (({"n": 1}, 200), True)
+    other = payload_fingerprint(_payload("11:05:00", title="Edited"))
+    with pytest.raises(IdempotencyKeyReused):
+        cache.run(key, 60, lambda: ({"n": 3}, 200), other)
+    # also once the result is only on disk, as another worker process sees it
+    with pytest.raises(IdempotencyKeyReused):
+        fresh = IdempotencyCache(Coordinator(tmp_path / "coord"))
+        fresh.run(key, 60, lambda: ({"n": 4}, 200), other)
@@ -0,0 +1,66 @@
+"""Looking up and paging through notes in the note index (receiver_index.py)."""
+
+import os
+import threading
+import time
+
+import receiver_index
+from receiver_index import NoteIndex
+
+
+def test_stale_index_checks_names_without_waiting_on_a_rescan(tmp_path, monkeypatch):
+    (tmp_path / "Doe2024.md").write_text("x")
+    index = NoteIndex(tmp_path, max_age_secs=30)
+    index.refresh()
+    assert index.present(["Doe2024.md", "Roe2023.md"]) == {"Doe2024.md"}
+
+    # a note arrives by sync, the snapshot ages, and listing the directory is now slow
+    (tmp_path / "Roe2023.md").write_text("x")
+    index._scanned_at -= 60
+    release = threading.Event()
+    scandir = os.scandir
+
+    def slow_scandir(path):
+        release.wait(10)
+        return scandir(path)
+
+    monkeypatch.setattr(receiver_index.os, "scandir", slow_scandir)
+    started = time.perf_counter()
+    assert index.present(["Doe2024.md", "Roe2023.md", "Poe2022.md"]) == {"Doe2024.md", "Roe2023.md"}
+    assert time.perf_counter() - started < 1
+    assert index.summary()["rescanning"]
+
+    release.set()
+    deadline = time.monotonic() + 10
+    while index.is_stale() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert index.present(["Roe2023.md"]) == {"Roe2023.md"}
+
+
+def _names(entries) -> list[str]:
+    return [entry.name for entry in entries]
+
+
+def test_pages_resume_after_the_cursor_within_the_filters(tmp_path):
+    names = ["Abe2020.md", "Doe2021.md", "Doe2022.md", "Doe2023.md", "Doe2024.md", "Roe2023.md"]
+    for i, name in enumerate(names):
+        (tmp_path / name).write_text("x")
+        os.utime(tmp_path / name, (1000 + i, 1000 + i))  # mtimes in name order
+    index = NoteIndex(tmp_path)
+
+    assert _names(index.iter_entries()) == names
+    assert _names(index.iter_entries("Doe", after="Doe2022.md")) == ["Doe2023.md", "Doe2024.md"]
+    # a cursor before the prefix starts at the prefix, one past it ends the listing
+    assert _names(index.iter_entries("Doe", after="Abe2020.md"))[0] == "Doe2021.md"
+    assert _names(index.iter_entries("Doe", after="Doe2024.md")) == []
+
+    # prefix and modified_since together, two to a page
+    pages, cursor = [], ""
+    while cursor is not None:
+        page, cursor = index.page("Doe", modified_since=1002, cursor=cursor, limit=2)
+        pages.append(_names(page))
+    assert pages == [["Doe2022.md", "Doe2023.md"], ["Doe2024.md"]]
+
+    # a page that takes the last entries says so, even when it's exactly full
+    page, cursor = index.page(modified_since=1004, limit=2)
+    assert _names(page) == ["Doe2024.md", "Roe2023.md"] and cursor is None
@@ -0,0 +1,32 @@
+"""Log arguments and request context across threads (receiver_logging.py)."""
+
+import threading
+
+import zotero_to_obsidian_note_receiver as receiver
+from receiver_logging import citekey_var, log_context, request_id_var, truncate
+
+
+def test_truncated_payload_snapshot_is_bounded():
+    payload = {
+        "data": [{"citekey": f"Doe{i}", "notes": ["<p>" + "x" * 1_000_000]} for i in range(1000)]
+    }
+    logged = truncate(payload, limit=50)
+    payload["data"].clear()  # changed before the listener formats the record: it logs the snapshot
+    text = str(logged)
+    assert text.startswith("{'data': [{'citekey': 'Doe0'") and text.endswith("... [truncated]")
+    assert len(text) == 50 + len("... [truncated]")
+    assert str(truncate(payload)) == "{'data': []}"
+
+
+def test_popups_log_with_the_request_context():
+    seen = []
+    shown = threading.Event()
+
+    def popup(name: str) -> None:
+        seen.append((name, request_id_var.get(), citekey_var.get()))
+        shown.set()
+
+    with log_context(request_id="abcd1234", citekey="Doe2024"):
+        receiver.start_popup(popup, "overwrite")
+    assert shown.wait(5)
+    assert seen == [("overwrite", "abcd1234", "Doe2024")]
@@ -0,0 +1,42 @@
+"""Histograms and counters in the Prometheus text format (receiver_metrics.py)."""
+
+from receiver_metrics import MetricsRegistry
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    metrics = MetricsRegistry()
+    seconds = metrics.histogram(
+        "receiver_stage_seconds", "Time per stage", ("stage",), buckets=(0.1, 1, 0.5)
+    )
+    for value in (0.05, 0.1, 0.3, 2):  # 0.1 is on a bound, and le is inclusive
+        seconds.observe(value, stage="write")
+    seconds.observe(0.7, stage='say "hi"\n')
+    assert metrics.render().splitlines() == [
+        "# HELP receiver_stage_seconds Time per stage",
+        "# TYPE receiver_stage_seconds histogram",
+        'receiver_stage_seconds_bucket{stage="say \\"hi\\"\\n",le="0.1"} 0',
+        'receiver_stage_seconds_bucket{stage="say \\"hi\\"\\n",le="0.5"} 0',
+        'receiver_stage_seconds_bucket{stage="say \\"hi\\"\\n",le="1.0"} 1',
+        'receiver_stage_seconds_bucket{stage="say \\"hi\\"\\n",le="+Inf"} 1',
+        'receiver_stage_seconds_sum{stage="say \\"hi\\"\\n"} 0.7',
+        'receiver_stage_seconds_count{stage="say \\"hi\\"\\n"} 1',
+        'receiver_stage_seconds_bucket{stage="write",le="0.1"} 2',
+        'receiver_stage_seconds_bucket{stage="write",le="0.5"} 3',
+        'receiver_stage_seconds_bucket{stage="write",le="1.0"} 3',
+        'receiver_stage_seconds_bucket{stage="write",le="+Inf"} 4',
+        'receiver_stage_seconds_sum{stage="write"} 2.45',
+        'receiver_stage_seconds_count{stage="write"} 4',
+    ]
+
+
+def test_unlabeled_metrics_start_at_zero_and_empty_histograms_render_no_series():
+    metrics = MetricsRegistry()
+    metrics.counter("receiver_write_conflicts_total", "Create conflicts")
+    metrics.histogram("receiver_webhook_seconds", "Webhook durations")
+    assert metrics.render() == (
+        "# HELP receiver_write_conflicts_total Create conflicts\n"
+        "# TYPE receiver_write_conflicts_total counter\n"
+        "receiver_write_conflicts_total 0\n"
+        "# HELP receiver_webhook_seconds Webhook durations\n"
+        "# TYPE receiver_webhook_seconds histogram\n"
+    )
@@ -0,0 +1,45 @@
+"""Requested and concurrent profiles (receiver_profiling.py)."""
+
+import threading
+import time
+
+from receiver_profiling import RequestProfiler
+
+
+def test_concurrent_requested_profiles_run_and_one_is_saved(tmp_path):
+    profiler = RequestProfiler(tmp_path)
+    overlap = threading.Barrier(3)
+    ran = []
+
+    def request(request_id: str) -> None:
+        with profiler.profile(request_id, requested=True):
+            overlap.wait(5)  # all three are inside profile() at once
+            time.sleep(0.05)
+            ran.append(request_id)
+
+    requests = [threading.Thread(target=request, args=(f"req{i}",)) for i in range(3)]
+    for thread in requests:
+        thread.start()
+    for thread in requests:
+        thread.join(10)
+
+    # every request did its work; only the one that got the profiler saved a profile
+    assert sorted(ran) == ["req0", "req1", "req2"]
+    assert len(list(tmp_path.glob("*.pstats"))) == 1
+
+    with profiler.profile("req3", requested=True):
+        pass
+    assert len(list(tmp_path.glob("*.pstats"))) == 2
+
+
+def test_request_runs_unprofiled_when_another_profiler_is_active(tmp_path, monkeypatch):
+    import cProfile
+
+    def enable(self):  # as on Python 3.12+ while, say, a debugger profiles the process
+        raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(cProfile.Profile, "enable", enable)
+    ran = False
+    with RequestProfiler(tmp_path).profile("req0", requested=True):
+        ran = True
+    assert ran and not list(tmp_path.glob("*.pstats"))
@@ -0,0 +1,71 @@
+"""Expiry, eviction and stats of the bounded registries (receiver_sessions.py)."""
+
+import pytest
+
+import receiver_sessions
+from receiver_sessions import ExpiringRegistry, Sweeper
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(receiver_sessions.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_their_ttl(clock):
+    registry = ExpiringRegistry("dialogs", max_entries=10, default_ttl_secs=60)
+    registry.put("a", 1)
+    registry.put("b", 2, ttl_secs=5)
+    assert registry.get("b") == 2 and "a" in registry
+
+    clock[0] += 5  # b's TTL is up, a's isn't
+    assert registry.get("b", "gone") == "gone" and "b" not in registry
+    assert registry.get("a") == 1
+
+    # entries nobody touches go in a sweep
+    registry.put("c", 3, ttl_secs=1)
+    clock[0] += 60
+    assert len(registry) == 2
+    assert registry.sweep() == 2 and len(registry) == 0
+    assert registry.stats() == {
+        "live": 0,
+        "max_entries": 10,
+        "added": 3,
+        "expired": 3,
+        "evicted": 0,
+    }
+
+
+def test_full_registry_evicts_the_oldest_entry(clock):
+    registry = ExpiringRegistry("results", max_entries=3, default_ttl_secs=60)
+    for key in "abcd":
+        registry.put(key, key.upper())
+    assert registry.keys() == ["b", "c", "d"] and registry.get("a") is None
+
+    registry.put("b", "B2")  # putting again makes b the newest
+    registry.put("e", "E")
+    assert registry.keys() == ["d", "b", "e"]
+    assert registry.pop("d") == "D" and registry.pop("d", "none") == "none"
+    assert registry.stats() == {
+        "live": 2,
+        "max_entries": 3,
+        "added": 6,
+        "expired": 0,
+        "evicted": 2,
+    }
+
+
+def test_sweeper_keeps_sweeping_past_a_failing_task(clock):
+    registry = ExpiringRegistry("dialogs", max_entries=10, default_ttl_secs=1)
+    registry.put("a", 1)
+    clock[0] += 2
+
+    def broken() -> None:
+        raise RuntimeError("disk gone")
+
+    sweeper = Sweeper(interval_secs=60)
+    sweeper.register(broken)
+    sweeper.register(registry.sweep)
+    sweeper.run_once()
+    assert sweeper.sweeps == 1 and len(registry) == 0
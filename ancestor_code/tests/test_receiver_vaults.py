@@ -0,0 +1,128 @@
+"""Routing payloads to vaults, and keeping a busy vault from holding up the others (receiver_vaults.py)."""
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import zotero_to_obsidian_note_receiver as receiver
+from receiver_vaults import Vault, VaultRegistry
+
+SLOW_WRITE_SECS = 1.5
+
+
+@pytest.fixture
+def two_vaults(tmp_path, monkeypatch):
+    registry = VaultRegistry(
+        [
+            Vault(vault_id, tmp_path / vault_id, "notes", coord_dir=tmp_path / f"{vault_id}-coord")
+            for vault_id in ("a", "b")
+        ]
+    )
+    monkeypatch.setattr(receiver, "vaults", registry)
+    monkeypatch.setattr(receiver.profiler, "slow_threshold_secs", None)
+    yield registry
+    registry.close()
+
+
+def _post(url: str, payload: dict) -> int:
+    request = urllib.request.Request(
+        url, json.dumps(payload).encode(), {"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def _write(vault_id: str, citekey: str) -> dict:
+    return {
+        "sender_id": receiver.SENDER_ID_ZOTERO_TO_OBSIDIAN_NOTE,
+        "vault_id": vault_id,
+        "data": [{"citekey": citekey}],
+    }
+
+
+def test_busy_vault_leaves_server_threads_for_the_others(two_vaults, monkeypatch):
+    from waitress.server import create_server
+
+    def write_notes(items, request_id, vault):
+        if vault.vault_id == "a":
+            time.sleep(SLOW_WRITE_SECS)
+        return [{"citekey": item["citekey"], "status": "created"} for item in items]
+
+    monkeypatch.setattr(receiver, "write_obsidian_md_note", write_notes)
+    threads = 4  # waitress's default
+    server = create_server(receiver.app, host="127.0.0.1", port=0, threads=threads)
+    threading.Thread(target=server.run, daemon=True).start()
+    receiver.share_server_threads(threads)
+    url = f"http://127.0.0.1:{server.effective_port}/webhook"
+    try:
+        codes_a = []
+        senders = [
+            threading.Thread(target=lambda i=i: codes_a.append(_post(url, _write("a", f"A{i}"))))
+            for i in range(8)
+        ]
+        for sender in senders:
+            sender.start()
+        time.sleep(0.3)  # vault a is now at its share, writing
+        started = time.perf_counter()
+        code_b = _post(url, _write("b", "B0"))
+        elapsed_b = time.perf_counter() - started
+        for sender in senders:
+            sender.join(30)
+    finally:
+        server.close()
+
+    assert code_b == 200 and elapsed_b < SLOW_WRITE_SECS / 2
+    # vault a kept to its share and turned the rest away, rather than queueing them on server threads
+    assert sorted(set(codes_a)) == [200, 503]
+    assert codes_a.count(200) <= two_vaults.get("a").thread_share
+
+
+@pytest.fixture
+def written_to(two_vaults, monkeypatch):
+    """The vault_id each write went to, in order."""
+    written = []
+
+    def write_notes(items, request_id, vault):
+        written.append(vault.vault_id)
+        return [{"citekey": item["citekey"], "status": "created"} for item in items]
+
+    monkeypatch.setattr(receiver, "write_obsidian_md_note", write_notes)
+    return written
+
+
+def test_payload_field_then_header_then_query_picks_the_vault(two_vaults, written_to):
+    client = receiver.app.test_client()
+    cases = [
+        ({"json": _write("b", "B0")}, "b"),
+        ({"json": _write("b", "B1"), "headers": {"X-Vault-Id": "a"}}, "b"),  # payload field wins
+        ({"json": _write(None, "A0"), "headers": {"X-Vault-Id": "b"}}, "b"),
+        ({"json": _write(None, "A1"), "query_string": {"vault": "b"}}, "b"),
+        ({"json": _write(None, "A2")}, "a"),  # the default vault
+    ]
+    for kwargs, vault_id in cases:
+        response = client.post("/webhook", **kwargs)
+        assert response.status_code == 200 and response.get_json()["vault_id"] == vault_id
+    assert written_to == ["b", "b", "b", "b", "a"]
+
+
+def test_unknown_vault_is_400_and_busy_vault_is_503(two_vaults, written_to):
+    client = receiver.app.test_client()
+    response = client.post("/webhook", json=_write("c", "C0"))
+    assert response.status_code == 400 and "Unknown vault_id 'c'" in response.get_json()["message"]
+
+    vault_a = two_vaults.get("a")
+    vault_a.max_pending = 1
+    with vault_a.admit():  # a write already in progress takes vault a's one place
+        response = client.post("/webhook", json=_write("a", "A0"))
+        assert response.status_code == 503 and response.headers["Retry-After"] == "5"
+        assert "busy" in response.get_json()["message"]
+        assert client.post("/webhook", json=_write("b", "B0")).status_code == 200
+    assert client.post("/webhook", json=_write("a", "A0")).status_code == 200
+    assert written_to == ["b", "a"]
@@ -3,25 +3,54 @@ the corresponding obsidian notes.  Dialog buttons that popup if the file the rec
 
 https://www.perplexity.ai/search/the-javascript-below-is-intend-Tic7.jP4TQiZ6R9CAl9EBQ
 
-The companion javascript for this, zotero_to_obsidian_note_sender.js, goes into the zotero action and tags plugin."""
+The companion javascript for this, zotero_to_obsidian_note_sender.js, goes into the zotero action and tags plugin.
 
+Startup is kept short: tkinter is only imported when a dialog is actually shown, and the first request's
+one-time work (template compile, notes index, Obsidian plugin config) runs in a warm-up thread that flips
+/ready when it's done."""
+
+import time
+
+_IMPORT_STARTED = time.perf_counter()  # import time is reported on /metrics
+
+import argparse
+import atexit
+import contextlib
+import contextvars
 import json
 import logging
+import multiprocessing
+import re
+import socket
 import threading
-import time
 import uuid
 import urllib.parse
-import tkinter as tk
-from tkinter import messagebox
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Union
+from typing import Callable, Union
 
 import bs4
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, send_from_directory
 from jinja2 import Template
 from waitress import serve  # type: ignore
 import open_obsidian_note_by_uri as onu
+from receiver_changes import sse_events, sse_retry
+from receiver_coordination import Coordinator, LockTimeout
+from receiver_idempotency import IdempotencyKeyReused, idempotency_key, payload_fingerprint
+from receiver_logging import configure_logging, log_context, truncate
+from receiver_metrics import MetricsRegistry
+from receiver_profiling import RequestProfiler, profile_asked
+from receiver_sessions import Sweeper
+from receiver_vaults import (
+    DEFAULT_VAULT_ID,
+    VAULT_ID_QUERY_ARG,
+    UnknownVault,
+    Vault,
+    VaultBusy,
+    VaultRegistry,
+    vault_id_of,
+)
 
 # Operating system path Obsidian Vault the top directory (includes the vault name)
 OS_PATH_TO_VAULT_ROOT = Path(
@@ -39,9 +68,98 @@ RECEIVER_BUTTON_WAIT_SECS = 20
 
 # port used by webhook
 LISTEN_PORT = 5050
+
+# Number of receiver processes sharing LISTEN_PORT (needs SO_REUSEPORT, so Linux; elsewhere it's 1)
+RECEIVER_WORKERS = 1
+# Waitress threads per receiver process.  A request holds one until it's done, waiting on a dialog
+# answer included, so each vault's writes only get their share of the threads /changes waits and
+# opens don't need (share_server_threads): a busy vault answers 503 instead of stalling the others.
+RECEIVER_THREADS = 8
+
+# Threads of the asyncio serving mode (receiver_asgi.py) besides each vault's VAULT_WORKERS, which
+# convert and write notes: for status, dialog bookkeeping and looking up the notes to open, and for
+# launching Obsidian.  Requests waiting on a dialog answer or another request hold none of them.
+ASYNC_FILE_THREADS = 4
+ASYNC_LAUNCH_THREADS = 2
+
+# Locks and dialog answers shared by every receiver process or host writing into the same notes.
+# None: a local directory per vault, enough for the worker processes of one host.  Hosts sharing a
+# vault must see the same directory, on a filesystem that carries locks: a network share, not the
+# cloud-synced vault itself (see receiver_coordination.py).
+RECEIVER_COORD_DIR: Union[Path, None] = None
+
+# To serve several vaults, list them in this JSON file (format in receiver_vaults.py); each payload then
+# picks its vault by vault_id.  Without the file, the vault above is the only one, as vault_id "default".
+RECEIVER_VAULTS_FILE = Path("receiver_vaults.json")
+# Each vault's writes in progress before it answers 503: under waitress at most its share of
+# RECEIVER_THREADS; in the asyncio mode (receiver_asgi.py) up to VAULT_MAX_PENDING, queued for the
+# vault's own VAULT_WORKERS threads that convert and write notes.  Opens don't count (only notes they
+# create do): they run on the server's threads, or on ASYNC_FILE_THREADS and ASYNC_LAUNCH_THREADS.
+VAULT_WORKERS = 2
+VAULT_MAX_PENDING = 32
+
+# How long a finished webhook result is replayed to duplicates.  Client-supplied idempotency keys
+# cover retries after a sender timeout (RECEIVER_RESPONSE_WAIT_TIMEOUT_SECS on the zotero side).
+# Keys derived from the payload hash only catch double-fired actions: a deliberate resend of the
+# same items a little later must still write/open again.
+IDEMPOTENCY_TTL_SECS = 120
+IDEMPOTENCY_DERIVED_TTL_SECS = 5
+
+# Bounds on long-lived in-memory state: open dialog sessions and replayable webhook results.
+# Stale entries also go in a background sweep every REGISTRY_SWEEP_SECS.
+DIALOG_SESSION_TTL_SECS = 5 * RECEIVER_BUTTON_WAIT_SECS
+DIALOG_SESSION_MAX = 256
+IDEMPOTENCY_MAX_RESULTS = 1000
+REGISTRY_SWEEP_SECS = 60
+
+# The note index behind /status and /notes is rescanned when the notes directory changes, or
+# when it's older than this (edits to existing notes don't change the directory mtime)
+NOTE_INDEX_MAX_AGE_SECS = 30
+NOTES_PAGE_SIZE = 500
+NOTES_PAGE_SIZE_MAX = 5000
+
+# The /changes feed of note additions, edits and deletions (see receiver_changes.py).  The last
+# CHANGE_FEED_MAX changes per vault are kept; while a client waits on the feed the notes directory
+# is rescanned every CHANGE_SCAN_SECS.  Long polls wait up to CHANGES_POLL_SECS; SSE streams send a
+# keep-alive every CHANGES_KEEPALIVE_SECS and end after CHANGES_STREAM_SECS (EventSource reconnects
+# on its own CHANGES_RETRY_SECS later, from its last event id).  Each waiting client holds a
+# waitress thread, so only CHANGES_MAX_WAITING wait at once (the ASGI mode holds no thread and has
+# no such limit).  Each receiver process keeps its own feed, and the port spreads a client's polls
+# over the processes sharing it, so with more than one worker (--workers) /changes answers 501.
+CHANGE_FEED_MAX = 10000
+CHANGE_SCAN_SECS = 10
+CHANGES_POLL_SECS = 25
+CHANGES_KEEPALIVE_SECS = 15
+CHANGES_STREAM_SECS = 300
+CHANGES_RETRY_SECS = 1
+CHANGES_MAX_WAITING = 2
+
+# Per-request profiles, listed and downloaded from /profiles.  A request is cProfiled if it has an
+# X-Profile: 1 header or ?profile=1 (or true, yes, on; 0 or false don't); it's stack sampled if it
+# runs longer than PROFILE_SLOW_SECS (None turns that off).
+PROFILE_DIR = Path("receiver_profiles")
+PROFILE_SLOW_SECS: Union[float, None] = None
+PROFILE_MAX_SAVED = 200
+
+# How long to wait for another worker that's busy with the same note (it may be showing a dialog)
+NOTE_LOCK_TIMEOUT_SECS = RECEIVER_BUTTON_WAIT_SECS + 10
+
+# Opening notes: the notes that don't exist get one warning, listing up to OPEN_MISSING_LISTED of
+# them.  With OPEN_CREATE_MISSING (or "create_missing": true in the payload) they're created instead,
+# where the request has the item data for it.
+OPEN_MISSING_LISTED = 15
+OPEN_CREATE_MISSING = False
+
 # the installer script should use the same file
 # TODO: just move this to onu.* so it's in one central file?
 RECEIVER_LOG_FILE = "zotero_item_receiver.log"
+# JSON lines, rotated at RECEIVER_LOG_MAX_BYTES keeping RECEIVER_LOG_BACKUPS old files
+RECEIVER_LOG_MAX_BYTES = 10 * 1024 * 1024
+RECEIVER_LOG_BACKUPS = 5
+# DEBUG adds note index scans, session evictions and resolved note paths; per-logger overrides
+# quiet noisy libraries
+RECEIVER_LOG_LEVEL = "INFO"
+RECEIVER_LOGGER_LEVELS = {"waitress": "WARNING", "werkzeug": "WARNING"}
 
 SENDER_ID_ZOTERO_TO_OBSIDIAN_NOTE = "zotero_to_obsidian_note"
 SENDER_ID_OPEN_OBSIDIAN_NOTE = "open_obsidian_note"
@@ -134,6 +252,12 @@ ___
 """
 
 
+@lru_cache(maxsize=1)
+def note_template() -> Template:
+    """The compiled note template (compiled once, not per item)."""
+    return Template(template_str, trim_blocks=True, lstrip_blocks=True)
+
+
 def zotero_note_html_to_md(zotero_note_html: str) -> str:
     """Convert from html into Obsidian markdown one note of the
     'notes' key in a Zotero item JSON export."""
@@ -406,40 +530,144 @@ def convert_inline_formatting(element: Union[str, bs4.element.Tag]) -> str:
 
 # Set up functions for webhook receiver overwrite/skip/skip all popup dialogs
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler(RECEIVER_LOG_FILE), logging.StreamHandler()],
-)
 logger = logging.getLogger(__name__)
 
-dir_lock = threading.Lock()  # lock needed for reliable existence detect
 
-# Dictionary to store overwrite/skip/skipall dialog results
-dialog_events: dict[str, dict] = {}
-dialog_answers: dict[str, str] = {}
+def start_logging(log_file: str = RECEIVER_LOG_FILE, level: str = RECEIVER_LOG_LEVEL) -> None:
+    """Send this process's logging to log_file and the console, off the request threads.
+    Called at startup (and in each worker process), not at import."""
+    log_listener = configure_logging(
+        log_file,
+        level=level,
+        logger_levels=RECEIVER_LOGGER_LEVELS,
+        max_bytes=RECEIVER_LOG_MAX_BYTES,
+        backup_count=RECEIVER_LOG_BACKUPS,
+    )
+    atexit.register(log_listener.stop)  # flush what's still queued
+
+
+def vault_settings() -> dict:
+    """Settings every vault gets unless the vaults file says otherwise."""
+    return dict(
+        notes_path=VAULT_PATH_NOTES,
+        workers=VAULT_WORKERS,
+        max_pending=VAULT_MAX_PENDING,
+        dialog_ttl_secs=DIALOG_SESSION_TTL_SECS,
+        max_dialogs=DIALOG_SESSION_MAX,
+        max_results=IDEMPOTENCY_MAX_RESULTS,
+        results_ttl_secs=IDEMPOTENCY_TTL_SECS,
+        index_max_age_secs=NOTE_INDEX_MAX_AGE_SECS,
+        max_changes=CHANGE_FEED_MAX,
+        change_scan_secs=CHANGE_SCAN_SECS,
+    )
+
+
+def load_vaults(vaults_file: Union[str, Path] = RECEIVER_VAULTS_FILE) -> VaultRegistry:
+    """The vaults listed in vaults_file, or if there's no such file, the one configured above."""
+    if Path(vaults_file).is_file():
+        return VaultRegistry.from_file(vaults_file, **vault_settings())
+    settings = dict(vault_settings(), coord_dir=RECEIVER_COORD_DIR)
+    return VaultRegistry([Vault(DEFAULT_VAULT_ID, OS_PATH_TO_VAULT_ROOT, **settings)])
+
+
+# The vaults and their per-note locks, dialog answers, replayable results and note indexes
+vaults = load_vaults()
+sweeper = Sweeper(REGISTRY_SWEEP_SECS)
+sweeper.register(lambda: vaults.sweep())
+
+
+def use_vault(vault_root: Union[str, Path], notes_path: str = VAULT_PATH_NOTES) -> None:
+    """Serve just this vault, as the default vault, e.g. a temporary one for benchmarks.  Its
+    coordination state, replayable results and note index start out empty, and its coordination
+    directory is inside it, so removing the vault leaves nothing behind."""
+    global vaults
+    previous = vaults
+    settings = dict(
+        vault_settings(), notes_path=notes_path, coord_dir=Path(vault_root) / ".receiver_coord"
+    )
+    vaults = VaultRegistry([Vault(DEFAULT_VAULT_ID, vault_root, **settings)])
+    previous.close()
+
+
+def share_server_threads(threads: int = RECEIVER_THREADS) -> None:
+    """Split a waitress server's threads between the vaults' writes, keeping back the ones /changes
+    waits may hold and one for opens and status."""
+    share = vaults.share_threads(max(1, threads - CHANGES_MAX_WAITING - 1))
+    logger.info("Each vault's writes may hold %d of %d server threads", share, threads)
+
+
+profiler = RequestProfiler(
+    PROFILE_DIR, slow_threshold_secs=PROFILE_SLOW_SECS, max_profiles=PROFILE_MAX_SAVED
+)
+
+# Where request time goes (see /metrics)
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram(
+    "receiver_stage_seconds",
+    "Time spent in each processing stage",
+    ("stage",),
+)
+webhook_seconds = metrics.histogram(
+    "receiver_webhook_seconds",
+    "Total /webhook request time",
+    ("vault", "sender_id", "code"),
+)
+
+
+def sender_label(sender_id) -> str:
+    """sender_id as a metric label: a known sender, else "unknown" (so a payload can't add label
+    values, and series, of its own)."""
+    if sender_id in (SENDER_ID_ZOTERO_TO_OBSIDIAN_NOTE, SENDER_ID_OPEN_OBSIDIAN_NOTE):
+        return sender_id
+    return "unknown"
 
 
-# HTML template for the dialog
-def ensure_storage_dir(request_id: str) -> bool:
-    """Ensure the storage directory exists with proper synchronization.
+items_total = metrics.counter(
+    "receiver_items_total", "Webhook items handled, by outcome", ("vault", "sender_id", "outcome")
+)
+bytes_written_total = metrics.counter(
+    "receiver_bytes_written_total", "Bytes of note markdown written"
+)
+write_conflicts_total = metrics.counter(
+    "receiver_write_conflicts_total", "Note writes that found the note already there"
+)
+cache_hits_total = metrics.counter(
+    "receiver_cache_hits_total", "Results served from a cache", ("cache",)
+)
+cache_misses_total = metrics.counter(
+    "receiver_cache_misses_total", "Results that had to be computed", ("cache",)
+)
+startup_seconds = metrics.gauge(
+    "receiver_startup_seconds",
+    "Module import, warm-up and first /webhook request durations",
+    ("phase",),
+)
+
+# Set once warm_up() has done the first request's one-time work (see /ready)
+ready = threading.Event()
+_first_request_seen = threading.Event()
+
+
+def ensure_storage_dir(vault: Vault, request_id: str) -> bool:
+    """Ensure the vault's storage directory exists with proper synchronization.
     Returns True if successful, False otherwise."""
-    with dir_lock:
-        if not NOTES_OS_PATH.exists():
-            logger.info(f"[{request_id}] Creating storage directory: {NOTES_OS_PATH}")
+    notes_dir = vault.notes_dir
+    if notes_dir.is_dir():
+        return True  # the usual case: no lock needed
+
+    with vault.coord.lock("storage-dir"):
+        if not notes_dir.exists():
+            logger.info("Creating storage directory: %s", notes_dir)
             try:
-                NOTES_OS_PATH.mkdir(parents=True, exist_ok=True)
-                # Small delay to ensure directory is fully created and visible to all threads
-                time.sleep(0.1)
+                # mkdir has returned only once the directory exists, so no settling delay is needed
+                notes_dir.mkdir(parents=True, exist_ok=True)
             except Exception as e:
-                logger.error(f"[{request_id}] Error creating directory: {e}")
+                logger.error("Error creating directory: %s", e)
                 return False
 
         # Double-check directory exists
-        if not NOTES_OS_PATH.exists():
-            logger.error(
-                f"[{request_id}] Directory does not exist after creation attempt: {NOTES_OS_PATH}"
-            )
+        if not notes_dir.is_dir():
+            logger.error("Directory does not exist after creation attempt: %s", notes_dir)
             return False
 
         return True
@@ -448,36 +676,99 @@ def ensure_storage_dir(request_id: str) -> bool:
 app = Flask(__name__)
 
 
-def dialog_response(dialog_id: str) -> tuple:
-    """Handle dialog response"""
-    if dialog_id not in dialog_events:
-        return "Dialog not found", 404
+def tk_dialogs():
+    """tkinter and its messagebox, imported on first use: most runs never show a dialog."""
+    import tkinter as tk
+    from tkinter import messagebox
+
+    return tk, messagebox
 
-    action = request.form.get("action", "skip")
-    logger.info(f"Dialog {dialog_id} response: {action}")
 
-    # Store the result
-    dialog_answers[dialog_id] = action
+@app.route("/dialog_response/<dialog_id>", methods=["POST"])
+def dialog_response(dialog_id: str) -> tuple:
+    """Handle dialog response.  Any worker can take it: the answer goes to the shared board."""
+    action = request.form.get("action", "skip")
+    if not any(vault.coord.post_answer(dialog_id, action) for vault in vaults):
+        logger.warning(
+            "Dropped answer '%s' for dialog %s: it has closed (timed out) or never existed",
+            action,
+            dialog_id,
+        )
+        return "Dialog not found", 404
 
-    # Signal the event to notify the waiting thread
-    dialog_events[dialog_id]["event"].set()
+    logger.info("Dialog %s response: %s", dialog_id, action)
 
     # Return success - the browser window should be closed by JavaScript
     return "OK", 200
 
 
+def start_popup(popup: Callable, *args) -> None:
+    """Show a popup from its own thread, which logs with the request's request_id and citekey."""
+    context = contextvars.copy_context()
+    threading.Thread(
+        target=context.run, args=(popup, *args), name=popup.__name__, daemon=True
+    ).start()
+
+
 def ask_overwrite_popup(
-    citekey: str, is_last_item: bool, total_items: int, request_id: str
+    vault: Vault, citekey: str, is_last_item: bool, total_items: int, request_id: str
 ) -> str:
+    """Ask whether to overwrite an existing note.  The answer can come from the local popup or
+    from /dialog_response on any worker; no answer within RECEIVER_BUTTON_WAIT_SECS skips this note."""
+    coord = vault.coord
+    dialog_id = f"{request_id}-{uuid.uuid4().hex[:8]}"
+    coord.open_dialog(
+        dialog_id, {"citekey": citekey, "request_id": request_id, "vault": vault.vault_id}
+    )
+
+    start_popup(overwrite_popup, coord, dialog_id, citekey, RECEIVER_BUTTON_WAIT_SECS)
+    try:
+        answer = coord.wait_answer(dialog_id, RECEIVER_BUTTON_WAIT_SECS)
+    finally:
+        coord.close_dialog(dialog_id)
+
+    if answer is None:
+        logger.info("No answer for %s within %ss, skipping it", citekey, RECEIVER_BUTTON_WAIT_SECS)
+        return "skip"
+    logger.info("User selected '%s' for %s", answer, citekey)
+    return answer
+
+
+def overwrite_popup(
+    coord: Coordinator, dialog_id: str, citekey: str, timeout_secs: float = RECEIVER_BUTTON_WAIT_SECS
+) -> None:
+    """The local overwrite dialog.  Posts its answer to the board, like /dialog_response does.
+    Closes itself after timeout_secs, when the request stops waiting for the answer."""
+    tk, messagebox = tk_dialogs()
     root = tk.Tk()
     root.withdraw()
-    result = messagebox.askyesno(
-        "File Exists", f"File '{citekey}.md' already exists. Overwrite?"
-    )
+    timed_out = False
+
+    def time_out() -> None:
+        nonlocal timed_out
+        timed_out = True
+        root.destroy()  # takes the message box with it
+
+    root.after(int(timeout_secs * 1000), time_out)
+    try:
+        result = messagebox.askyesno(
+            "File Exists", f"File '{citekey}.md' already exists. Overwrite?", parent=root
+        )
+    except tk.TclError:
+        result = None
+    if timed_out:
+        logger.info("Closed unanswered overwrite dialog for %s after %ss", citekey, timeout_secs)
+        return
     root.destroy()
-    answer = "overwrite" if result else "skip"
-    logger.info(f"User selected '{answer}' for {citekey}")
-    return answer
+
+    action = "overwrite" if result else "skip"
+    if not coord.post_answer(dialog_id, action):
+        # answered just as the request gave up waiting: the note was skipped
+        logger.warning("Dropped late answer '%s' for %s: the note was not changed", action, citekey)
+
+
+# /webhook's answers to requests it turns away before acting on them
+REQUEST_ERROR_STATUS = {UnknownVault: 400, IdempotencyKeyReused: 422, VaultBusy: 503}
 
 
 @app.route("/webhook", methods=["POST"])
@@ -485,176 +776,340 @@ def webhook() -> tuple:
     """
     Endpoint that receives webhook data from Zotero Tags and Actions plugin.
     Expects a JSON array of objects with zotero item information, including itemkey and citekey.
+    Duplicate requests (same idempotency key) get the first request's result instead of redoing it.
     """
     # Generate a unique ID for this request for traceability
     request_id = str(uuid.uuid4())[:8]
-    logger.info(f"[{request_id}] Received webhook request")
-
-    try:
-        # Get the JSON data from the request
-        payload = request.get_json()
-        sender_id = payload.get("sender_id")
-        webhook_item_list = payload.get("data")
-
-        if not webhook_item_list:
-            logger.error(f"[{request_id}] No data received")
-            return jsonify({"status": "error", "message": "No data received"}), 400
-
-        if not isinstance(webhook_item_list, list):
-            logger.error(
-                f"[{request_id}] Expected JSON array, got {type(webhook_item_list)}: {webhook_item_list}"
-            )
-            return jsonify({"status": "error", "message": "Expected JSON array"}), 400
+    with log_context(request_id=request_id):
+        logger.info("Received webhook request")
+        started = time.perf_counter()
+        sender = "unknown"  # metric label, see sender_label()
+        vault_id = None
+        profile_requested = profile_asked(
+            request.headers.get("X-Profile"), request.args.get("profile")
+        )
 
-        logger.info(f"[{request_id}] Processing {len(webhook_item_list)} items")
+        def profiled_process_webhook() -> tuple[dict, int]:
+            with profiler.profile(request_id, requested=profile_requested):
+                return process_webhook(payload, request_id, vault)
 
-        # Ensure storage directory exists before processing
-        if not ensure_storage_dir(request_id):
+        try:
+            # Get the JSON data from the request
+            with stage_seconds.time(stage="parse"):
+                payload = request.get_json()
+            sender = sender_label(payload.get("sender_id"))
+            vault = vaults.get(vault_id_of(request.headers, request.args, payload))
+            vault_id = vault.vault_id
+            key, client_supplied = idempotency_key(request.headers, payload)
+            ttl_secs = IDEMPOTENCY_TTL_SECS if client_supplied else IDEMPOTENCY_DERIVED_TTL_SECS
+            # a write, or a duplicate waiting for one, holds one of the vault's share of server
+            # threads (VaultBusy past it); opens only count the notes they create (open_notes_batch)
+            admit = (
+                vault.admit()
+                if payload.get("sender_id") == SENDER_ID_ZOTERO_TO_OBSIDIAN_NOTE
+                else contextlib.nullcontext()
+            )
+            with admit:
+                (body, status_code), replayed = vault.idempotency.run(
+                    key, ttl_secs, profiled_process_webhook, payload_fingerprint(payload)
+                )
+        except tuple(REQUEST_ERROR_STATUS) as e:
+            status_code = REQUEST_ERROR_STATUS[type(e)]
+            logger.warning("%s", e)
+            webhook_seconds.observe(
+                time.perf_counter() - started, vault=vault_id, sender_id=sender, code=status_code
+            )
+            response = jsonify({"status": "error", "message": str(e), "request_id": request_id})
+            if status_code == 503:
+                response.headers["Retry-After"] = "5"
+            return response, status_code
+        except Exception as e:
+            logger.exception("Error processing webhook data: %s", e)
+            webhook_seconds.observe(
+                time.perf_counter() - started, vault=vault_id, sender_id=sender, code=500
+            )
             return jsonify(
-                {
-                    "status": "error",
-                    "message": "Failed to create storage directory",
-                    "request_id": request_id,
-                }
+                {"status": "error", "message": str(e), "request_id": request_id}
             ), 500
 
-        if not sender_id:
-            logger.error(f"[{request_id}] Payload missing sender_id")
-            return jsonify({"status": "error", "message": "Missing sender_id"}), 400
+        elapsed = time.perf_counter() - started
+        webhook_seconds.observe(elapsed, vault=vault_id, sender_id=sender, code=status_code)
+        if not _first_request_seen.is_set():
+            _first_request_seen.set()
+            startup_seconds.set(elapsed, phase="first_request")
+        (cache_hits_total if replayed else cache_misses_total).inc(cache="idempotency")
+        if replayed:
+            logger.info("Duplicate of request %s, replaying its result", body.get("request_id"))
+
+        response = jsonify(dict(body, vault_id=vault_id, idempotency_key=key, replayed=replayed))
+        response.headers["Idempotent-Replayed"] = "true" if replayed else "false"
+        return response, status_code
+
+
+def process_webhook(payload: dict, request_id: str, vault: Vault) -> tuple[dict, int]:
+    """Act on one webhook payload, in its vault.  Returns the response body and HTTP status."""
+    try:
+        if (error := check_webhook_payload(payload)) is not None:
+            return error
+        sender_id = payload["sender_id"]
+        webhook_item_list = payload["data"]
+
+        logger.info("Processing %d items", len(webhook_item_list))
+
+        # Ensure storage directory exists before processing
+        if not ensure_storage_dir(vault, request_id):
+            return storage_dir_error(request_id)
 
         if sender_id == SENDER_ID_ZOTERO_TO_OBSIDIAN_NOTE:
-            results = write_obsidian_md_note(webhook_item_list, request_id)
-        elif sender_id == SENDER_ID_OPEN_OBSIDIAN_NOTE:
-            # TODO: add dialog asking if want to write the note, since item should already be in zotero if here
-            results = open_note_in_new_tab(
-                webhook_item_list, request_id, items_data=webhook_item_list
-            )
+            results = write_obsidian_md_note(webhook_item_list, request_id, vault)
+            summary = {}
         else:
-            logger.error(f"[{request_id}] Unknown sender_id, got {sender_id}")
-            return jsonify({"status": "error", "message": f"Unknown {sender_id=}"}), 400
+            summary = open_notes_batch(
+                webhook_item_list,
+                request_id,
+                vault,
+                items_data=webhook_item_list,
+                create_missing=bool(payload.get("create_missing", OPEN_CREATE_MISSING)),
+            )
+            results = summary.pop("results")
+
+        logger.info("Ended webhook message processing with %d items acted upon", len(results))
+        return webhook_success(results, request_id, **summary)
+
+    except Exception as e:
+        logger.exception("Error processing webhook data: %s", e)
+        return {"status": "error", "message": str(e), "request_id": request_id}, 500
+
 
-        logger.info(
-            f"[{request_id}] Ended webhook message processing with {len(results)} items acted upon"
+def check_webhook_payload(payload: dict) -> Union[tuple[dict, int], None]:
+    """The error response for a malformed webhook payload, or None if it's one we can act on."""
+    sender_id = payload.get("sender_id")
+    webhook_item_list = payload.get("data")
+
+    if not webhook_item_list:
+        logger.error("No data received")
+        return {"status": "error", "message": "No data received"}, 400
+
+    if not isinstance(webhook_item_list, list):
+        logger.error(
+            "Expected JSON array, got %s: %s",
+            type(webhook_item_list),
+            truncate(webhook_item_list),
         )
+        return {"status": "error", "message": "Expected JSON array"}, 400
 
-        return jsonify(
-            {
-                "status": "success",
-                "processed": len(results),
-                "items": results,
-                "request_id": request_id,
-            }
-        ), 200
+    if not sender_id:
+        logger.error("Payload missing sender_id")
+        return {"status": "error", "message": "Missing sender_id"}, 400
 
-    except Exception as e:
-        logger.exception(f"[{request_id}] Error processing webhook data: {str(e)}")
-        return jsonify(
-            {"status": "error", "message": str(e), "request_id": request_id}
-        ), 500
+    if sender_id not in (SENDER_ID_ZOTERO_TO_OBSIDIAN_NOTE, SENDER_ID_OPEN_OBSIDIAN_NOTE):
+        logger.error("Unknown sender_id, got %s", truncate(sender_id))
+        return {"status": "error", "message": f"Unknown {sender_id=}"}, 400
+
+    return None
+
+
+def storage_dir_error(request_id: str) -> tuple[dict, int]:
+    return {
+        "status": "error",
+        "message": "Failed to create storage directory",
+        "request_id": request_id,
+    }, 500
+
+
+def webhook_success(results: list, request_id: str, **summary) -> tuple[dict, int]:
+    return {
+        "status": "success",
+        "processed": len(results),
+        "items": results,
+        **summary,
+        "request_id": request_id,
+    }, 200
 
 
-def nonexistent_note_popup(citekey: str, request_id: str) -> None:
-    """Show a warning popup that a note doesn't exist.
+def missing_notes_popup(citekeys: list, request_id: str) -> None:
+    """Show one warning popup listing the notes that don't exist.
 
     Args:
-        citekey: The citekey of the note that doesn't exist
+        citekeys: The citekeys of the notes that don't exist
         request_id: Unique ID for this request
 
     Returns:
         None
     """
+    tk, messagebox = tk_dialogs()
     root = tk.Tk()
     root.withdraw()
 
-    messagebox.showwarning(
-        "Note Does Not Exist", f"Note '{citekey}.md' does not exist."
-    )
+    if len(citekeys) == 1:
+        messagebox.showwarning(
+            "Note Does Not Exist", f"Note '{citekeys[0]}.md' does not exist.", parent=root
+        )
+    else:
+        listed = [f"{citekey}.md" for citekey in citekeys[:OPEN_MISSING_LISTED]]
+        if len(citekeys) > OPEN_MISSING_LISTED:
+            listed.append(f"... and {len(citekeys) - OPEN_MISSING_LISTED} more")
+        messagebox.showwarning(
+            f"{len(citekeys)} Notes Do Not Exist",
+            "These notes do not exist:\n\n" + "\n".join(listed),
+            parent=root,
+        )
 
     root.destroy()
 
-    logger.info(
-        f"[{request_id}] User acknowledged non-existent note warning for {citekey}"
-    )
+    logger.info("User acknowledged non-existent note warning for %d notes", len(citekeys))
 
 
 def open_note_in_new_tab(
     citekey_or_keys: Union[str, list],
     request_id: str,
+    vault: Vault,
     items_data: Union[dict, list, None] = None,
 ) -> list:
-    """Opens existing note(s) in new obsidian tab(s).
-    If a note doesn't exist, shows a popup asking user to cancel or create the note.
-
-    Args:
-        citekey_or_keys: Single citekey string or list of citekeys
-        request_id: Unique ID for this request
-        items_data: Optional dict or list of dicts containing item data for note creation
-                    (needed if user chooses to create a non-existent note)
+    """Opens existing note(s) in new obsidian tab(s), warning once about any that don't exist.
+    See open_notes_batch.
 
     Return value is list of attempted citekeys, for now.
     """
-
     citekeys = (
         citekey_or_keys if isinstance(citekey_or_keys, list) else [citekey_or_keys]
     )
+    return open_notes_batch(citekeys, request_id, vault, items_data)["results"]
 
-    # If items_data is provided, convert to dict keyed by citekey for easy lookup
-    items_dict = {}
-    if items_data:
-        if isinstance(items_data, dict):
-            items_dict[items_data.get("citekey")] = items_data
-        elif isinstance(items_data, list):
-            for item in items_data:
-                if "citekey" in item:
-                    items_dict[item["citekey"]] = item
 
+def open_notes_batch(
+    entries: list,
+    request_id: str,
+    vault: Vault,
+    items_data: Union[dict, list, None] = None,
+    create_missing: bool = False,
+) -> dict:
+    """Open a batch of notes: resolve every citekey against the note index at once, launch the
+    existing notes without waiting on each launch, then deal with the missing ones together, with
+    a single warning or (create_missing) by writing them from items_data.
+
+    Args:
+        entries: Citekeys, or item dicts with a citekey
+        request_id: Unique ID for this request
+        vault: The vault the notes are in
+        items_data: Optional dict or list of dicts containing item data, used to create missing notes
+        create_missing: Create missing notes that have item data, instead of warning about them
+
+    Returns a dict of results (a line per citekey, as before), opened, created and missing citekeys.
+    """
+    existing, missing = resolve_notes(entries, vault)
+    results = launch_notes(existing, request_id, vault)
+
+    created = []
+    if create_missing:
+        items = items_by_citekey(items_data)
+        to_create = [items[citekey] for citekey in missing if citekey in items]
+        if to_create:
+            # opens the notes it creates, like any other write, and counts as one
+            try:
+                with vault.admit():
+                    records = write_obsidian_md_note(to_create, request_id, vault)
+            except VaultBusy as e:
+                logger.warning("%s; not creating the missing notes", e)
+                records = []
+            created = [record["citekey"] for record in records if record["status"] == "created"]
+            results += [f"Created note at {vault.note_path(citekey)}" for citekey in created]
+    missing = [citekey for citekey in missing if citekey not in created]
+
+    results += announce_missing(missing, request_id, vault)
+    return {"results": results, "opened": existing, "created": created, "missing": missing}
+
+
+def resolve_notes(entries: list, vault: Vault) -> tuple[list, list]:
+    """The citekeys of entries (citekeys, or item dicts with one) that have a note, and that don't,
+    in request order without repeats.  One pass over the note index (or, while it's stale, a stat
+    per note)."""
+    citekeys = []
+    for entry in entries:
+        citekey = entry.get("citekey") if isinstance(entry, dict) else entry
+        if not citekey or not isinstance(citekey, str):
+            logger.warning("No citekey in open request entry: %s", truncate(entry))
+            continue
+        citekeys.append(citekey)
+    citekeys = list(dict.fromkeys(citekeys))
+
+    with stage_seconds.time(stage="resolve_notes"):
+        present = vault.note_index.present(f"{citekey}.md" for citekey in citekeys)
+    existing = [citekey for citekey in citekeys if f"{citekey}.md" in present]
+    missing = [citekey for citekey in citekeys if f"{citekey}.md" not in present]
+    logger.info("Open request: %d notes exist, %d don't", len(existing), len(missing))
+    return existing, missing
+
+
+def items_by_citekey(items_data: Union[dict, list, None]) -> dict:
+    """The item dicts in items_data (a dict, or a list that may also hold bare citekeys) by citekey,
+    ready to write: the ones without an itemkey can't be."""
+    if isinstance(items_data, dict):
+        items_data = [items_data]
+    items = {}
+    for item in items_data or []:
+        if isinstance(item, dict) and item.get("citekey") and item.get("itemkey"):
+            items[item["citekey"]] = dict(item, notes=list(item.get("notes", [])))
+    return items
+
+
+def launch_notes(citekeys: list, request_id: str, vault: Vault) -> list:
+    """Hand each note to Obsidian, without waiting for one launch before starting the next."""
     results = []
     for citekey in citekeys:
-        try:
-            notepath_vault = f"{VAULT_PATH_NOTES}/{citekey}.md"
-            filepath_os = OS_PATH_TO_VAULT_ROOT / notepath_vault
-
-            # Check if note exists before trying to open it
-
-            if not filepath_os.exists():
-                logger.info(f"[{request_id}] Note does not exist: {notepath_vault}")
-                nonexistent_note_popup(citekey, request_id)
-                logger.info(f"[{request_id}] Skipping non-existent note {citekey}")
-                results.append(f"Skipped - note does not exist: {notepath_vault}")
-                continue
-
-            # Note exists, proceed to open it
-            status = onu.open_obsidian_note(notepath_vault, OS_PATH_TO_VAULT_ROOT)
-
-            message_tail = f"({citekey}): {status=})"
-            if not (
-                status["note_found"]
-                and status["vault_found"]
-                and status["uri_used"] != ""
-            ):
-                logger.info(
-                    f"[{request_id}] Couldn't open note in Obsidian due to path or URI problem {message_tail}"
-                )
-            elif status["new_tab_requested"] and status["new_tab_possible"] is not True:
-                logger.info(
-                    f"[{request_id}] Couldn't open note in NEW Obsidian tab due to Obsidian config problem {message_tail}"
+        with log_context(citekey=citekey):
+            notepath_vault = vault.note_path(citekey)
+            try:
+                with stage_seconds.time(stage="open_note"):
+                    status = onu.open_obsidian_note(notepath_vault, vault.root, wait=False)
+                items_total.inc(
+                    vault=vault.vault_id, sender_id=SENDER_ID_OPEN_OBSIDIAN_NOTE, outcome="opened"
                 )
-        except Exception as e:
-            logger.info(
-                f"[{request_id}] Problem opening Obsidian note for item {citekey}: ", e
-            )
 
-        results.append(f"Tried to open note at {notepath_vault}")
+                if not (
+                    status["note_found"]
+                    and status["vault_found"]
+                    and status["uri_used"] != ""
+                ):
+                    logger.info(
+                        "Couldn't open note in Obsidian due to path or URI problem (%s): status=%s",
+                        citekey,
+                        status,
+                    )
+                elif status["new_tab_requested"] and status["new_tab_possible"] is not True:
+                    logger.info(
+                        "Couldn't open note in NEW Obsidian tab due to Obsidian config problem (%s): status=%s",
+                        citekey,
+                        status,
+                    )
+            except Exception as e:
+                logger.info("Problem opening Obsidian note for item %s: %s", citekey, e)
 
+            results.append(f"Tried to open note at {notepath_vault}")
     return results
 
 
-def write_obsidian_md_note(items: list, request_id: str) -> list:
-    """Write an Obsidian note from the items data, avoiding overwrite unless user accepts it,
-    and returning status of items written."""
+def announce_missing(citekeys: list, request_id: str, vault: Vault) -> list:
+    """One warning for all of the missing notes, shown without waiting for the user to dismiss it."""
+    if not citekeys:
+        return []
+    logger.info("Notes do not exist: %s", ", ".join(citekeys))
+    items_total.inc(
+        len(citekeys),
+        vault=vault.vault_id,
+        sender_id=SENDER_ID_OPEN_OBSIDIAN_NOTE,
+        outcome="missing",
+    )
+    start_popup(missing_notes_popup, citekeys, request_id)
+    return [f"Skipped - note does not exist: {vault.note_path(citekey)}" for citekey in citekeys]
 
-    if not ensure_storage_dir(request_id):
-        logger.error(f"[{request_id}] Could not ensure storage directory exists")
+
+def write_obsidian_md_note(items: list, request_id: str, vault: Vault) -> list:
+    """Write an Obsidian note into the vault from the items data, avoiding overwrite unless user
+    accepts it, and returning status of items written."""
+
+    if not ensure_storage_dir(vault, request_id):
+        logger.error("Could not ensure storage directory exists")
         return []
 
     total_items = len(items)
@@ -662,161 +1117,559 @@ def write_obsidian_md_note(items: list, request_id: str) -> list:
     skip_all = False
     for index, item in enumerate(items):
         if skip_all:
-            logger.info(
-                f"[{request_id}] Skipping remaining items due to timeout or 'skip all' selection"
-            )
+            logger.info("Skipping remaining items due to timeout or 'skip all' selection")
             break
-
-        itemkey = item.get("itemkey")
-        citekey = item.get("citekey")
-        if not itemkey or not citekey:
-            logger.warning(f"[{request_id}] Missing required keys in item: {item}")
+        if not item_is_writable(item):
             continue
 
-        logger.info(
-            f"[{request_id}] Working on item {index + 1}/{total_items}: {citekey}"
+        # One worker at a time per note; a duplicate of the same write then finds identical content
+        citekey = item["citekey"]
+        try:
+            with log_context(citekey=citekey), vault.coord.note_lock(
+                citekey, timeout=NOTE_LOCK_TIMEOUT_SECS
+            ):
+                skip_all = write_one_item(
+                    item, index, total_items, obs_note_write_record, request_id, vault
+                )
+        except LockTimeout:
+            logger.warning("Skipping %s: another worker is still busy with it", citekey)
+
+    return obs_note_write_record
+
+
+def item_is_writable(item: dict) -> bool:
+    """True if the item has the keys a note needs; logs the ones that don't."""
+    if not item.get("itemkey") or not item.get("citekey"):
+        logger.warning("Missing required keys in item: %s", truncate(item))
+        return False
+    return True
+
+
+def write_one_item(
+    item: dict,
+    index: int,
+    total_items: int,
+    obs_note_write_record: list,
+    request_id: str,
+    vault: Vault,
+) -> bool:
+    """Write the note for one item, appending to obs_note_write_record.  The caller holds the
+    note lock.  Returns True if the user asked to skip all remaining items."""
+    obs_note_markdown = create_item_note(
+        item, index, total_items, obs_note_write_record, request_id, vault
+    )
+    if obs_note_markdown is None:
+        return False
+
+    with stage_seconds.time(stage="dialog_wait"):
+        answer = ask_overwrite_popup(
+            vault, item["citekey"], index == total_items - 1, total_items, request_id
+        )
+    return apply_overwrite_answer(
+        answer, item, obs_note_markdown, obs_note_write_record, request_id, vault
+    )
+
+
+def create_item_note(
+    item: dict,
+    index: int,
+    total_items: int,
+    obs_note_write_record: list,
+    request_id: str,
+    vault: Vault,
+) -> Union[str, None]:
+    """The first half of write_one_item: create the item's note, unless it exists.  Returns None
+    if that settled it (created, or already identical), else the note's markdown, for
+    apply_overwrite_answer once the user has said whether to overwrite."""
+    itemkey = item.get("itemkey")
+    citekey = item.get("citekey")
+    logger.info("Working on item %d/%d: %s", index + 1, total_items, citekey)
+
+    obs_note_markdown = render_item_note(item)
+
+    # Write obsidian lit note without overwiting existing note, unless user confirms
+    note_path_in_vault = vault.note_path(citekey)
+    filepath_os = vault.note_file(citekey)
+
+    if write_note_file(vault, note_path_in_vault, obs_note_markdown, overwrite=False):
+        obs_note_write_record.append(note_record(item, filepath_os, "created"))
+        open_note_in_new_tab(citekey, request_id, vault)
+        logger.info("Completed item: citekey=%r, itemkey=%r", citekey, itemkey)
+        return None
+
+    logger.info("File already exists: %s", note_path_in_vault)
+
+    # A duplicate of a write that already landed (maybe from another worker): nothing to ask
+    if note_content_matches(filepath_os, obs_note_markdown):
+        logger.info("Identical note already written: %s", note_path_in_vault)
+        obs_note_write_record.append(note_record(item, filepath_os, "unchanged"))
+        items_total.inc(
+            vault=vault.vault_id, sender_id=SENDER_ID_ZOTERO_TO_OBSIDIAN_NOTE, outcome="unchanged"
+        )
+        return None
+
+    return obs_note_markdown
+
+
+def apply_overwrite_answer(
+    answer: str,
+    item: dict,
+    obs_note_markdown: str,
+    obs_note_write_record: list,
+    request_id: str,
+    vault: Vault,
+) -> bool:
+    """The second half of write_one_item: act on the user's answer about overwriting the item's
+    note.  Returns True if the user asked to skip all remaining items."""
+    itemkey = item.get("itemkey")
+    citekey = item.get("citekey")
+    note_path_in_vault = vault.note_path(citekey)
+    filepath_os = vault.note_file(citekey)
+
+    if answer == "open":
+        logger.info("Opening file: %s", note_path_in_vault)
+        open_note_in_new_tab(citekey, request_id, vault)
+        return False
+    if answer == "skip":
+        logger.info("Skipping file: %s", note_path_in_vault)
+        items_total.inc(
+            vault=vault.vault_id, sender_id=SENDER_ID_ZOTERO_TO_OBSIDIAN_NOTE, outcome="skipped"
         )
+        return False
+    elif answer == "skip_all":
+        logger.info("Skipping all remaining operations")
+        return True
+
+    # Do overwrite, as requested
+    write_note_file(vault, note_path_in_vault, obs_note_markdown, overwrite=True)
+    obs_note_write_record.append(note_record(item, filepath_os, "overwritten"))
+    open_note_in_new_tab(citekey, request_id, vault)
+    logger.info("Completed item: citekey=%r, itemkey=%r", citekey, itemkey)
+    return False
 
-        # zotero item note(s) to obsidian markdown
-        notes_md = []
-        for note_html in item["notes"]:
+
+def render_item_note(item: dict) -> str:
+    """The Obsidian markdown for one item.  Replaces item["notes"] with their markdown."""
+    # zotero item note(s) to obsidian markdown
+    notes_md = []
+    for note_html in item["notes"]:
+        with stage_seconds.time(stage="convert"):
             md_note = zotero_note_html_to_md(note_html)
-            notes_md.append(md_note)
-        item["notes"] = notes_md
+        notes_md.append(md_note)
+    item["notes"] = notes_md
 
-        # all item data to markdown
-        template = Template(template_str, trim_blocks=True, lstrip_blocks=True)
-        obs_note_markdown = template.render(**item)
+    # all item data to markdown
+    template = note_template()
+    with stage_seconds.time(stage="render"):
+        return template.render(**item)
 
-        def write_note(
-            notepath_in_vault: Union[str, Path], obs_note_markdown: str, overwrite: bool
-        ) -> str:
-            """Write an obsidian note and open it in a new Obsidian tab.  If overwrite=False,
-            then a write Exception will mean that the file already exists."""
 
-            filepath_os = OS_PATH_TO_VAULT_ROOT / notepath_in_vault
-            try:
-                if overwrite:
-                    with open(filepath_os, "w", encoding="utf-8") as f:
-                        f.write(obs_note_markdown)
-                        logger.info(
-                            f"[{request_id}] Successfully overwrote file: {filepath_os}"
-                        )
-                else:
-                    # EAFP atomic file create approach:  Try to open the file in 'x' mode which fails if file exists
-                    with open(filepath_os, "x", encoding="utf-8") as f:
-                        f.write(obs_note_markdown)
-                        logger.info(
-                            f"[{request_id}] Successfully created file: {filepath_os}"
-                        )
-            except FileExistsError:
-                return "exists"
-
-            logger.debug(
-                f"[{request_id}] Checking existence of: {filepath_os.resolve()}"
-            )
+def write_note_file(
+    vault: Vault, notepath_in_vault: Union[str, Path], obs_note_markdown: str, overwrite: bool
+) -> bool:
+    """Write an obsidian note.  With overwrite=False the note is only created if it doesn't
+    exist yet: returns False (and writes nothing) if it does."""
 
-            obs_note_write_record.append(
-                dict(
-                    itemkey=itemkey,
-                    citekey=citekey,
-                    timestamp=datetime.now().strftime("%Y%m%d_%H%M%S"),
-                    filepath=str(filepath_os),
-                )
-            )
+    filepath_os = vault.root / notepath_in_vault
+    write_started = time.perf_counter()
+    try:
+        if overwrite:
+            with open(filepath_os, "w", encoding="utf-8") as f:
+                f.write(obs_note_markdown)
+                logger.info("Successfully overwrote file: %s", filepath_os)
+        else:
+            # EAFP atomic file create approach:  Try to open the file in 'x' mode which fails if file exists
+            with open(filepath_os, "x", encoding="utf-8") as f:
+                f.write(obs_note_markdown)
+                logger.info("Successfully created file: %s", filepath_os)
+    except FileExistsError:
+        write_conflicts_total.inc()
+        return False
+    stage_seconds.observe(time.perf_counter() - write_started, stage="write")
+    bytes_written_total.inc(len(obs_note_markdown.encode("utf-8")))
+    items_total.inc(
+        vault=vault.vault_id,
+        sender_id=SENDER_ID_ZOTERO_TO_OBSIDIAN_NOTE,
+        outcome="overwritten" if overwrite else "created",
+    )
+    vault.note_index.record_write(filepath_os)
+    return True
+
+
+def note_record(item: dict, filepath_os: Path, status: str) -> dict:
+    """One entry of a webhook response's items: what happened to an item's note."""
+    return dict(
+        itemkey=item.get("itemkey"),
+        citekey=item.get("citekey"),
+        timestamp=datetime.now().strftime("%Y%m%d_%H%M%S"),
+        filepath=str(filepath_os),
+        status=status,
+    )
 
-            open_note_in_new_tab(citekey, request_id)
 
-            logger.info(f"[{request_id}] Completed item: {citekey=}, {itemkey=}")
+# The front-matter line the template fills with exportDate, which the sender sets to the send time
+_CREATED_DATE_LINE = re.compile(r"^created date: .*$", re.MULTILINE)
 
-            return "done"
 
-        # Write obsidian lit note without overwiting existing note, unless user confirms
-        note_basename = f"{citekey}.md"
-        note_path_in_vault = f"{VAULT_PATH_NOTES}/{note_basename}"
-        is_last_item = index == total_items - 1
+def note_content_matches(filepath_os: Path, obs_note_markdown: str) -> bool:
+    """True if the note on disk already holds this markdown, but for its created date: a second send
+    of the same item, a few seconds later, still matches."""
+    try:
+        on_disk = filepath_os.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError):
+        return False
+    return _without_created_date(on_disk) == _without_created_date(obs_note_markdown)
 
-        if (
-            write_resp := write_note(
-                note_path_in_vault, obs_note_markdown, overwrite=False
-            )
-        ) == "exists":
-            logger.info(f"[{request_id}] File already exists: {note_path_in_vault}")
-
-            answer = ask_overwrite_popup(citekey, is_last_item, total_items, request_id)
-            if answer == "open":
-                logger.info(f"[{request_id}] Opening file: {note_path_in_vault}")
-                open_note_in_new_tab(citekey, request_id)
-                continue
-            if answer == "skip":
-                logger.info(f"[{request_id}] Skipping file: {note_path_in_vault}")
-                continue
-            elif answer == "skip_all":
-                logger.info(f"[{request_id}] Skipping all remaining operations")
-                skip_all = True
-                continue
-
-            # Do overwrite, as requested
-            if (
-                write_note(note_path_in_vault, obs_note_markdown, overwrite=True)
-                != "done"
-            ):
-                logger.error(f"[{request_id}] Error overwriting file", exc_info=True)
-                continue
-        elif write_resp != "done":
-            logger.error(
-                f"[{request_id}] Error writing file: {write_resp=}", exc_info=True
-            )
-            continue
 
-    return obs_note_write_record
+def _without_created_date(markdown: str) -> str:
+    return _CREATED_DATE_LINE.sub("created date:", markdown, count=1)
+
+
+@app.route("/ready", methods=["GET"])
+def ready_endpoint():
+    """Readiness probe: 503 until warm-up has finished, then 200."""
+    body = {"ready": ready.is_set(), "time": datetime.now().isoformat()}
+    return jsonify(body), 200 if ready.is_set() else 503
+
+
+@app.route("/health", methods=["GET"])
+def health():
+    """Cheap liveness probe: touches nothing on disk."""
+    return jsonify({"status": "ok", "time": datetime.now().isoformat()})
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Stage latency histograms and counters, in Prometheus text format (this worker only)."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/profiles", methods=["GET"])
+def list_profiles():
+    """The saved request profiles, newest first."""
+    return jsonify({"profiles": profiler.list_profiles()})
+
+
+@app.route("/profiles/<name>", methods=["GET"])
+def download_profile(name: str):
+    """Download one saved profile (.pstats or .collapsed)."""
+    if not profiler.has_profile(name):
+        return jsonify({"status": "error", "message": f"No profile {name}"}), 404
+    return send_from_directory(profiler.profiles_dir.resolve(), name, as_attachment=True)
 
 
 @app.route("/status", methods=["GET"])
 def status():
-    """Simple endpoint to verify to sender that receiver is running"""
-    # First ensure storage directory exists
-    if not NOTES_OS_PATH.exists():
-        return jsonify(
-            {
-                "status": "running",
-                "time": datetime.now().isoformat(),
-                "storage_dir": str(NOTES_OS_PATH),
-                "storage_exists": False,
-                "files_in_dir": [],
-            }
-        )
+    """Endpoint to verify to sender that receiver is running, with a cached summary of the notes
+    directory.  List the notes themselves with /notes, and follow changes to them with /changes."""
+    return jsonify(status_body())
+
+
+def status_body() -> dict:
+    """The default vault's status at the top level, as before there were several, then every vault's."""
+    vault_status = {vault.vault_id: vault_status_body(vault) for vault in vaults}
+    return dict(
+        vault_status[vaults.default_id],
+        status="running",
+        time=datetime.now().isoformat(),
+        sessions=session_stats(),
+        default_vault=vaults.default_id,
+        vaults=vault_status,
+    )
 
-    try:
-        files_list = [f.name for f in NOTES_OS_PATH.iterdir() if f.is_file()]
-    except Exception as e:
-        files_list = [f"Error listing files: {str(e)}"]
 
+def vault_status_body(vault: Vault) -> dict:
+    storage_exists = vault.notes_dir.exists()
+    return {
+        "storage_dir": str(vault.notes_dir),
+        "storage_exists": storage_exists,
+        "notes": vault.note_index.summary() if storage_exists else None,
+        "active_dialogs": vault.coord.active_dialogs(),
+        "queue": vault.stats(),
+    }
+
+
+@app.route("/notes", methods=["GET"])
+def list_notes():
+    """List the notes directory, a page at a time or as streamed NDJSON (?format=ndjson).
+
+    Query args: prefix (name prefix), modified_since (epoch seconds or ISO 8601),
+    cursor (from the previous page's next_cursor), limit (page size), vault (default vault if none)."""
+    try:
+        note_index = vaults.get(request.args.get(VAULT_ID_QUERY_ARG)).note_index
+    except UnknownVault as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
+    prefix = request.args.get("prefix", "")
+    cursor = request.args.get("cursor", "")
+    try:
+        modified_since = parse_modified_since(request.args.get("modified_since"))
+        limit = min(int(request.args.get("limit", NOTES_PAGE_SIZE)), NOTES_PAGE_SIZE_MAX)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if limit < 1:
+        return jsonify({"status": "error", "message": "limit must be positive"}), 400
+
+    if request.args.get("format") == "ndjson":
+        entries = note_index.iter_entries(prefix, modified_since, after=cursor)
+        lines = (json.dumps(entry.as_dict()) + "\n" for entry in entries)
+        return Response(lines, mimetype="application/x-ndjson")
+
+    page, next_cursor = note_index.page(prefix, modified_since, cursor, limit)
     return jsonify(
         {
-            "status": "running",
-            "time": datetime.now().isoformat(),
-            "storage_dir": str(NOTES_OS_PATH),
-            "storage_exists": True,
-            "files_in_dir": files_list,
-            "active_dialogs": list(dialog_events.keys()),
+            "notes": [entry.as_dict() for entry in page],
+            "count": len(page),
+            "next_cursor": next_cursor,
         }
     )
 
 
+# Waitress threads held by /changes long polls and streams
+_changes_waiting = threading.BoundedSemaphore(CHANGES_MAX_WAITING)
+# Receiver processes sharing the listen port (serve_workers); /changes needs it to be 1
+_port_workers = 1
+
+
+@app.route("/changes", methods=["GET"])
+def changes():
+    """Note changes since a cursor, as a long poll: waits up to `timeout` seconds if there are none yet.
+
+    Query args: cursor (the previous response's cursor; none gets a reset), timeout (seconds, at most
+    CHANGES_POLL_SECS, 0 doesn't wait), limit (changes per response), vault (default vault if none).
+    With reset true, relist /notes, then continue from the returned cursor."""
+    if _port_workers > 1:
+        return changes_unavailable()
+    try:
+        vault = vaults.get(request.args.get(VAULT_ID_QUERY_ARG))
+    except UnknownVault as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
+    cursor = request.args.get("cursor") or None
+    try:
+        timeout = min(float(request.args.get("timeout", CHANGES_POLL_SECS)), CHANGES_POLL_SECS)
+        limit = min(int(request.args.get("limit", NOTES_PAGE_SIZE)), NOTES_PAGE_SIZE_MAX)
+        pending = vault.changes.pending(cursor)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if limit < 1:
+        return jsonify({"status": "error", "message": "limit must be positive"}), 400
+
+    if pending or timeout <= 0:
+        body = vault.changes.since(cursor, limit)
+    elif not _changes_waiting.acquire(blocking=False):
+        return changes_busy()
+    else:
+        try:
+            body = vault.wait_changes(cursor, timeout, limit)
+        finally:
+            _changes_waiting.release()
+    return jsonify(dict(body, vault_id=vault.vault_id))
+
+
+@app.route("/changes/stream", methods=["GET"])
+def change_stream():
+    """Note changes as Server-Sent Events: `change` events, and a `reset` event (relist /notes) when
+    the cursor (Last-Event-ID header or ?cursor=) can't be continued from.  Query arg: vault."""
+    if _port_workers > 1:
+        return changes_unavailable()
+    try:
+        vault = vaults.get(request.args.get(VAULT_ID_QUERY_ARG))
+    except UnknownVault as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
+    cursor = request.headers.get("Last-Event-ID") or request.args.get("cursor") or None
+    try:
+        vault.changes.pending(cursor)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if not _changes_waiting.acquire(blocking=False):
+        return changes_busy()
+
+    def events():
+        nonlocal cursor
+        try:
+            yield sse_retry(CHANGES_RETRY_SECS)  # sends the headers now, not with the first change
+            deadline = time.monotonic() + CHANGES_STREAM_SECS
+            while time.monotonic() < deadline:
+                body = vault.wait_changes(cursor, CHANGES_KEEPALIVE_SECS, NOTES_PAGE_SIZE)
+                yield from sse_events(body, vault.changes.epoch)
+                cursor = body["cursor"]
+        finally:
+            _changes_waiting.release()
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def changes_unavailable() -> tuple:
+    """/changes with several worker processes: each has its own feed, with its own epoch, and
+    consecutive polls land on different ones, so every other poll would be a reset (a relisting)."""
+    message = (
+        f"The /changes feed needs a single receiver process, not {_port_workers} sharing the port: "
+        "run the receiver with --workers 1 to follow changes"
+    )
+    return jsonify({"status": "error", "message": message}), 501
+
+
+def changes_busy() -> tuple:
+    response = jsonify(
+        {"status": "error", "message": "Too many clients waiting on /changes, try again later"}
+    )
+    response.headers["Retry-After"] = str(CHANGES_KEEPALIVE_SECS)
+    return response, 503
+
+
+def parse_modified_since(value: Union[str, None]) -> Union[float, None]:
+    """Epoch seconds from an epoch number or ISO 8601 string (None if not given)."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"modified_since must be epoch seconds or ISO 8601, got {value!r}")
+
+
+def session_stats() -> dict:
+    """Live entries and evictions of the receiver's bounded registries (this worker only)."""
+    return {
+        "dialog_sessions": {v.vault_id: v.coord.dialog_sessions.stats() for v in vaults},
+        "webhook_results": {v.vault_id: v.idempotency.completed.stats() for v in vaults},
+        "sweeps": sweeper.sweeps,
+    }
+
+
+def warm_up() -> None:
+    """Do the first request's one-time work ahead of it, then flip /ready."""
+    started = time.perf_counter()
+    try:
+        note_template()
+        zotero_note_html_to_md("<div><p>warm <b>up</b></p></div>")  # bs4 parser setup
+        for vault in vaults:
+            ensure_storage_dir(vault, "warm-up")
+            vault.preload()
+    except Exception:
+        logger.exception("Warm-up failed; serving anyway, the first request does the rest")
+    elapsed = time.perf_counter() - started
+    startup_seconds.set(elapsed, phase="warmup")
+    logger.info("Warm-up done in %.3fs", elapsed)
+    ready.set()
+
+
+def serve_worker(worker_index: int, listen_socket: Union[socket.socket, None] = None) -> None:
+    """Run one waitress server.  With a listen_socket, several processes share the port."""
+    sweeper.start()
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    share_server_threads(RECEIVER_THREADS)
+    if listen_socket is None:
+        serve(app, host="0.0.0.0", port=LISTEN_PORT, threads=RECEIVER_THREADS)
+    else:
+        logger.info("Worker %d (pid %s) serving", worker_index, multiprocessing.current_process().pid)
+        serve(app, sockets=[listen_socket], threads=RECEIVER_THREADS)
+
+
+def reuseport_socket() -> socket.socket:
+    """A listening socket the kernel load-balances across every process that binds the same port."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(("0.0.0.0", LISTEN_PORT))
+    sock.listen(1024)
+    return sock
+
+
+def _reuseport_worker(worker_index: int, workers: int, log_level: str) -> None:
+    global _port_workers
+    _port_workers = workers
+    # one log file per worker: size rotation isn't safe with several processes on one file
+    log_file = Path(RECEIVER_LOG_FILE)
+    start_logging(str(log_file.with_name(f"{log_file.stem}.{worker_index}{log_file.suffix}")), log_level)
+    serve_worker(worker_index, reuseport_socket())
+
+
+def serve_workers(workers: int, log_level: str = RECEIVER_LOG_LEVEL) -> None:
+    """Serve with `workers` processes behind LISTEN_PORT.  The per-note locks in each vault's
+    coordination directory keep them from racing on the same citekey.  The /changes feed is per
+    process, so with several it answers 501 (changes_unavailable)."""
+    if workers <= 1:
+        serve_worker(0)
+        return
+    if not hasattr(socket, "SO_REUSEPORT") or not Path("/proc").exists():
+        # Windows has no SO_REUSEPORT and macOS doesn't balance it, so run one process there
+        # (or one receiver per host, sharing RECEIVER_COORD_DIR)
+        logger.warning("Can't share port %s between processes here, using 1 worker", LISTEN_PORT)
+        serve_worker(0)
+        return
+
+    processes = [
+        multiprocessing.Process(
+            target=_reuseport_worker, args=(i, workers, log_level), daemon=True
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+startup_seconds.set(time.perf_counter() - _IMPORT_STARTED, phase="import")
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Zotero to Obsidian note webhook receiver")
+    parser.add_argument(
+        "--profile-slow",
+        type=float,
+        default=PROFILE_SLOW_SECS,
+        metavar="SECS",
+        help="save stack samples of requests slower than SECS",
+    )
+    parser.add_argument(
+        "--log-level",
+        default=RECEIVER_LOG_LEVEL,
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="root log level",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=RECEIVER_WORKERS,
+        help="receiver processes sharing the listen port (Linux only; /changes needs 1)",
+    )
+    parser.add_argument(
+        "--vaults",
+        type=Path,
+        default=RECEIVER_VAULTS_FILE,
+        metavar="FILE",
+        help="JSON file of the vaults to serve (see receiver_vaults.py)",
+    )
+    args = parser.parse_args()
+    start_logging(level=args.log_level)
+    profiler.slow_threshold_secs = args.profile_slow
+
     log_file = Path(RECEIVER_LOG_FILE)
     logger.info("Starting Zotero Item Receiver")
-    logger.info(f"Storage directory path: {NOTES_OS_PATH}")
-    logger.info(f"Log file: {log_file.resolve()}")
-
-    # Create storage directory at startup
-    try:
-        NOTES_OS_PATH.mkdir(parents=True, exist_ok=True)
-        logger.info("Storage directory exists or was created successfully")
-    except Exception as e:
-        logger.warning(f"Note: Could not create storage directory at startup: {e}")
+    if args.vaults != RECEIVER_VAULTS_FILE:
+        if not args.vaults.is_file():
+            parser.error(f"No vaults file {args.vaults}")
+        vaults = load_vaults(args.vaults)
+    for vault in vaults:
+        logger.info("Vault %s: storage directory path: %s", vault.vault_id, vault.notes_dir)
+    logger.info("Log file: %s", log_file.resolve())
+
+    # Create storage directories at startup
+    for vault in vaults:
+        try:
+            vault.notes_dir.mkdir(parents=True, exist_ok=True)
+            logger.info("Storage directory exists or was created successfully: %s", vault.notes_dir)
+        except Exception as e:
+            logger.warning("Note: Could not create storage directory at startup: %s", e)
 
     # Start waitress server, intead of flask, as it's more "production ready"
-    logger.info(f"Starting server on port {LISTEN_PORT}")
-    serve(app, host="0.0.0.0", port=LISTEN_PORT)
+    logger.info("Starting server on port %s with %d worker(s)", LISTEN_PORT, args.workers)
+    serve_workers(args.workers, args.log_level)